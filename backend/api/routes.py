@@ -1,16 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
-from db import session, models
-from core import parser, workflow
+import asyncio
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from db import session, models, bulk, pagination
+from core import parser, workflow, pipeline, jobs, metrics, extract, spans, prompts
+from core.cache import get_cache
+from core.endpoints import get_pool
 from sqlalchemy.orm import Session
-from sqlalchemy import asc
 from api.schemas import (
     UploadRequest, RuleCheckRequest, EditAcceptRequest,
-    GenerateRulesRequest, GenerateRulesResponse, ParagraphWithNeighborsResponse, 
-    RuleUpdateRequest, LLMQueryRequest, LLMQueryResponse, FixSuggestionsRequest
+    GenerateRulesRequest, GenerateRulesResponse, ParagraphOut, ParagraphWithNeighborsResponse,
+    RuleUpdateRequest, LLMQueryRequest, LLMQueryResponse, FixSuggestionsRequest,
+    DocumentCheckRequest, DocumentCheckResponse, JobCreateRequest, JobStatusResponse,
+    RuleCompactRequest, RuleCompactResponse, DocumentRecheckRequest, DocumentRecheckResponse
 )
 
 router = APIRouter()
 
+MAX_PARAGRAPH_WINDOW = 1000
+
+# Job payloads take the same options as the matching endpoint's request body
+JOB_PAYLOADS = {
+    "check_document": DocumentCheckRequest,
+    "recheck_document": DocumentRecheckRequest,
+    "generate_rules": GenerateRulesRequest,
+}
+
 def get_db():
     db = session.SessionLocal()
     try:
@@ -18,6 +37,11 @@ def get_db():
     finally:
         db.close()
 
+# Async routes run their queries through asyncio.to_thread so the event loop
+# (and every LLM call and SSE stream on it) never waits on the database
+def document_exists(db: Session, document_id: int) -> bool:
+    return db.query(models.Document.id).filter(models.Document.id == document_id).first() is not None
+
 # NEW: Upload document for rule generation (no paragraph splitting)
 @router.post("/upload_for_rules")
 def upload_for_rules(data: UploadRequest, db: Session = Depends(get_db)):
@@ -30,34 +54,100 @@ def upload_for_rules(data: UploadRequest, db: Session = Depends(get_db)):
 # Existing but renamed for clarity
 @router.post("/upload_for_checking")
 def upload_for_checking(data: UploadRequest, db: Session = Depends(get_db)):
-    doc = models.Document(name=data.name, content=data.content)
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
-    for para in parser.break_into_paragraphs(data.content):
-        db.add(models.Paragraph(document_id=doc.id, content=para))
-    db.commit()
-    return {"document_id": doc.id}
+    with metrics.stage("upload", "parse"):
+        paragraphs = parser.break_into_paragraphs(data.content)
+    with metrics.stage("upload", "persist"):
+        document_id, _ = bulk.insert_document(db, data.name, data.content, paragraphs)
+        db.commit()
+    return {"document_id": document_id}
+
+# Stream a large document as the raw request body; paragraphs are split as bytes
+# arrive and written in batches, so the full text is never held in memory
+@router.post("/upload_for_checking/stream")
+async def upload_for_checking_stream(name: str, request: Request, db: Session = Depends(get_db)):
+    batch_size = int(os.getenv("UPLOAD_BATCH_SIZE") or "500")
+    document_id, _ = await asyncio.to_thread(bulk.insert_document, db, name, None, [])
+    batch = []
+    paragraph_count = 0
+    async for paragraph in parser.aiter_paragraphs(request.stream()):
+        batch.append(paragraph)
+        if len(batch) >= batch_size:
+            await asyncio.to_thread(bulk.insert_paragraphs, db, document_id, batch, paragraph_count)
+            paragraph_count += len(batch)
+            batch = []
+    await asyncio.to_thread(bulk.insert_paragraphs, db, document_id, batch, paragraph_count)
+    paragraph_count += len(batch)
+    await asyncio.to_thread(db.commit)
+    return {"document_id": document_id, "paragraphs": paragraph_count}
+
+# Upload a txt/pdf/docx/csv file; text is extracted off the event loop (PDF pages in
+# parallel) and paragraphs are written in batches as extraction proceeds
+@router.post("/upload_for_checking/file")
+async def upload_file_for_checking(file: UploadFile, name: str | None = None, db: Session = Depends(get_db)):
+    try:
+        file_type = extract.file_type_of(file.filename or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    batch_size = int(os.getenv("UPLOAD_BATCH_SIZE") or "500")
+    path, file_hash = await extract.save_upload(file, suffix=f".{file_type}")
+    try:
+        document_id, _ = await asyncio.to_thread(bulk.insert_document, db, name or file.filename, None, [])
+        cache_info = {}
+        batch = []
+        paragraph_count = 0
+        with metrics.stage("upload_file", "extract"):
+            blocks = extract.aiter_file_text(db, path, file_type, file_hash, cache_info)
+            async for paragraph in parser.aiter_text_paragraphs(blocks):
+                batch.append(paragraph)
+                if len(batch) >= batch_size:
+                    await asyncio.to_thread(bulk.insert_paragraphs, db, document_id, batch, paragraph_count)
+                    paragraph_count += len(batch)
+                    batch = []
+        await asyncio.to_thread(bulk.insert_paragraphs, db, document_id, batch, paragraph_count)
+        paragraph_count += len(batch)
+        await asyncio.to_thread(db.commit)
+    finally:
+        os.unlink(path)
+    return {"document_id": document_id, "paragraphs": paragraph_count, "file_hash": file_hash,
+            "cached": cache_info["cached"]}
 
+# Extract the text of an uploaded file (e.g. a policy document for /generate_rules)
+@router.post("/extract_text")
+async def extract_text(file: UploadFile, db: Session = Depends(get_db)):
+    try:
+        file_type = extract.file_type_of(file.filename or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    path, file_hash = await extract.save_upload(file, suffix=f".{file_type}")
+    try:
+        cache_info = {}
+        text = "".join([block async for block in extract.aiter_file_text(db, path, file_type, file_hash, cache_info)])
+        await asyncio.to_thread(db.commit)
+    finally:
+        os.unlink(path)
+    return {"file_hash": file_hash, "text": text, "cached": cache_info["cached"]}
+
+# Paginated by position: pass the X-Next-Cursor header back as `after`
 @router.get("/document_paragraphs")
-def get_paragraphs(doc_id: int, db: Session = Depends(get_db)):
-    return db.query(models.Paragraph).filter(models.Paragraph.document_id == doc_id).all()
+def get_paragraphs(doc_id: int, after: int | None = None, limit: int | None = Query(None, ge=1),
+                   fields: str | None = None, db: Session = Depends(get_db)):
+    return pagination.keyset_page(db, models.Paragraph, "position", [models.Paragraph.document_id == doc_id],
+                                  after, limit, fields)
 
 @router.post("/generate_rules", response_model=GenerateRulesResponse)
-def generate_rules(data: GenerateRulesRequest, db: Session = Depends(get_db)):
-    rules = workflow.generate_compliance_rules(data.text)
-    created_ids = []
-    for i, rule in enumerate(rules):
-        rule_obj = models.ComplianceRule(name=f"Rule {i+1}", description=rule)
-        db.add(rule_obj)
-        db.commit()
-        db.refresh(rule_obj)
-        created_ids.append(rule_obj.id)
-    return {"rules": rules}
+async def generate_rules(data: GenerateRulesRequest, db: Session = Depends(get_db)):
+    return await pipeline.generate_rules(db, data.text, data.chunk_tokens)
 
+# Paginated by id: pass the X-Next-Cursor header back as `after`
 @router.get("/rules")
-def get_rules(db: Session = Depends(get_db)):
-    return db.query(models.ComplianceRule).all()
+def get_rules(after: int | None = None, limit: int | None = Query(None, ge=1),
+              fields: str | None = None, db: Session = Depends(get_db)):
+    return pagination.keyset_page(db, models.ComplianceRule, "id", [], after, limit, fields)
+
+# Merge near-duplicate rules (violations move to the kept rule)
+@router.post("/rules/compact", response_model=RuleCompactResponse)
+def compact_rules(data: RuleCompactRequest, db: Session = Depends(get_db)):
+    return pipeline.compact_rules(db, data.threshold, data.dry_run)
 
 @router.get("/rules/{rule_id}")
 def get_rule(rule_id: int, db: Session = Depends(get_db)):
@@ -73,6 +163,8 @@ def update_rule(rule_id: int, data: RuleUpdateRequest, db: Session = Depends(get
     if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
 
+    if rule.description != data.description:
+        pipeline.mark_rule_stale(db, rule.id)
     rule.name = data.name
     rule.description = data.description
     db.commit()
@@ -80,43 +172,166 @@ def update_rule(rule_id: int, data: RuleUpdateRequest, db: Session = Depends(get
     return {"id": rule.id, "name": rule.name, "description": rule.description}
 
 @router.post("/check_violation")
-def check_rule(data: RuleCheckRequest, db: Session = Depends(get_db)):
-    rule = db.query(models.ComplianceRule).filter(models.ComplianceRule.id == data.rule_id).first()
-    para = db.query(models.Paragraph).filter(models.Paragraph.id == data.paragraph_id).first()
-    result = workflow.evaluate_paragraph(para.content, rule.description)
-    v = models.Violation(paragraph_id=para.id, rule_id=rule.id, highlighted_text=result)
-    db.add(v)
-    db.commit()
-    return {"violation_id": v.id, "highlighted_text": result}
+async def check_rule(data: RuleCheckRequest, db: Session = Depends(get_db)):
+    def load():
+        rule = db.query(models.ComplianceRule).filter(models.ComplianceRule.id == data.rule_id).first()
+        para = db.query(models.Paragraph).filter(models.Paragraph.id == data.paragraph_id).first()
+        return rule, para
+
+    def save(v: models.Violation) -> int:
+        db.add(v)
+        db.commit()
+        return v.id
+
+    rule, para = await asyncio.to_thread(load)
+    result = await workflow.evaluate_paragraph(para.content, rule.description)
+    offsets = spans.violation_spans(para.content, result)
+    violation_id = await asyncio.to_thread(save, models.Violation(
+        paragraph_id=para.id, rule_id=rule.id, highlighted_text=result, spans=offsets,
+        template_version=prompts.check_version(),
+    ))
+    return {"violation_id": violation_id, "highlighted_text": result, "spans": offsets,
+            "violated": not spans.is_negative(result)}
+
+# Check a whole document against a rule set in one call
+@router.post("/documents/{document_id}/check", response_model=DocumentCheckResponse)
+async def check_document(document_id: int, data: DocumentCheckRequest, db: Session = Depends(get_db)):
+    if not await asyncio.to_thread(document_exists, db, document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return await pipeline.check_document(db, document_id, data.rule_ids, data.concurrency, data.pack_size,
+                                         exhaustive=data.exhaustive, top_k=data.top_k, min_score=data.min_score)
+
+# Re-evaluate only the (paragraph, rule) pairs invalidated by edits
+@router.post("/documents/{document_id}/recheck", response_model=DocumentRecheckResponse)
+async def recheck_document(document_id: int, data: DocumentRecheckRequest, db: Session = Depends(get_db)):
+    if not await asyncio.to_thread(document_exists, db, document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return await pipeline.recheck_document(db, document_id, data.concurrency, data.pack_size)
+
+# Queue long-running work for the worker service
+@router.post("/jobs")
+def create_job(data: JobCreateRequest, db: Session = Depends(get_db)):
+    if data.kind not in jobs.HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{data.kind}'")
+    try:
+        JOB_PAYLOADS[data.kind].model_validate(data.payload)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", "payload", *error["loc"])} for error in e.errors(include_url=False)
+        ])
+    job = jobs.enqueue(db, data.kind, data.payload)
+    return {"job_id": job.id}
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress_done": job.progress_done,
+        "progress_total": job.progress_total,
+        "eta_seconds": jobs.eta_seconds(job),
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
 
 @router.post("/suggest_fix")
-def fix_violations(data: FixSuggestionsRequest, db: Session = Depends(get_db)):
+async def fix_violations(data: FixSuggestionsRequest, db: Session = Depends(get_db)):
     if not data.violation_ids:
         raise HTTPException(status_code=400, detail="No violation IDs provided")
 
-    violations = db.query(models.Violation).filter(models.Violation.id.in_(data.violation_ids)).all()
+    violations = await asyncio.to_thread(pipeline.load_violations, db, data.violation_ids)
     if not violations:
         raise HTTPException(status_code=404, detail="No matching violations found")
 
     # Assume all violations are for the same paragraph
     paragraph = violations[0].paragraph
-    rule_texts = [v.highlighted_text for v in violations]
-
-    combined_prompt_context = "\n\n".join(rule_texts)
-    suggestion = workflow.get_fix_suggestion(paragraph.content, combined_prompt_context)
+    result = None
+    if pipeline.fix_mode(data.mode) == "spans":
+        result = await pipeline.span_fix(db, violations)
+    if result is None:
+        combined_prompt_context = await asyncio.to_thread(pipeline.fix_context, db, violations)
+        result = {"suggested_fix": await workflow.get_fix_suggestion(paragraph.content, combined_prompt_context)}
 
     # Optional: update each violation with same suggestion
-    for v in violations:
-        v.suggested_fix = suggestion
+    def save():
+        for v in violations:
+            v.suggested_fix = result["suggested_fix"]
+        db.commit()
 
-    db.commit()
-    return {"suggested_fix": suggestion}
+    await asyncio.to_thread(save)
+    return result
+
+def sse_event(data: dict) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+async def sse_stream(deltas, on_complete=None):
+    """Re-emit LLM content deltas as SSE events, then call on_complete with the full text."""
+    parts = []
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            yield sse_event({"content": delta})
+    except Exception as e:
+        yield sse_event({"error": f"LLM query failed: {str(e)}"})
+        return
+    if on_complete:
+        await asyncio.to_thread(on_complete, "".join(parts))
+    yield "data: [DONE]\n\n"
+
+async def single_delta(text: str):
+    yield text
+
+@router.post("/suggest_fix/stream")
+async def stream_fix_violations(data: FixSuggestionsRequest, db: Session = Depends(get_db)):
+    if not data.violation_ids:
+        raise HTTPException(status_code=400, detail="No violation IDs provided")
+
+    violations = await asyncio.to_thread(pipeline.load_violations, db, data.violation_ids)
+    if not violations:
+        raise HTTPException(status_code=404, detail="No matching violations found")
+
+    paragraph = violations[0].paragraph
+    result = None
+    # The span call can't be shown until it completes, so this rewrites (and streams) unless
+    # the request asks for spans; FIX_MODE only sets the default of /suggest_fix
+    if data.mode == "spans":
+        result = await pipeline.span_fix(db, violations)
+    violation_ids = [v.id for v in violations]
+
+    def save_suggestion(suggestion: str):
+        # The request's session may already be closed once streaming starts
+        stream_db = session.SessionLocal()
+        try:
+            stream_db.query(models.Violation).filter(models.Violation.id.in_(violation_ids)).update(
+                {models.Violation.suggested_fix: suggestion}, synchronize_session=False
+            )
+            stream_db.commit()
+        finally:
+            stream_db.close()
+
+    if result is not None:
+        # Span fixes are applied locally, so the fixed paragraph goes out as one event
+        deltas = single_delta(result["suggested_fix"])
+    else:
+        combined_prompt_context = await asyncio.to_thread(pipeline.fix_context, db, violations)
+        deltas = workflow.stream_fix_suggestion(paragraph.content, combined_prompt_context)
+    return StreamingResponse(sse_stream(deltas, save_suggestion), media_type="text/event-stream")
 
 @router.post("/accept_edit")
 def accept_edit(data: EditAcceptRequest, db: Session = Depends(get_db)):
     v = db.query(models.Violation).filter(models.Violation.id == data.violation_id).first()
     para = db.query(models.Paragraph).filter(models.Paragraph.id == v.paragraph_id).first()
+    if para.content != data.new_text:
+        pipeline.mark_paragraph_stale(db, para.id)
     para.content = data.new_text
+    para.content_hash = parser.content_hash(data.new_text)
     v.accepted = data.accepted
     db.commit()
     return {"status": "updated"}
@@ -127,18 +342,50 @@ def get_paragraph_with_neighbors(paragraph_id: int, db: Session = Depends(get_db
     if not target:
         raise HTTPException(status_code=404, detail="Paragraph not found")
 
-    all_paragraphs = db.query(models.Paragraph).filter(
-        models.Paragraph.document_id == target.document_id
-    ).order_by(asc(models.Paragraph.id)).all()
-
-    index = next((i for i, p in enumerate(all_paragraphs) if p.id == paragraph_id), None)
+    neighbors = {
+        p.position: p
+        for p in db.query(models.Paragraph).filter(
+            models.Paragraph.document_id == target.document_id,
+            models.Paragraph.position.between(target.position - 1, target.position + 1),
+        )
+    }
 
     return {
-        "previous": all_paragraphs[index - 1] if index > 0 else None,
-        "current": all_paragraphs[index],
-        "next": all_paragraphs[index + 1] if index < len(all_paragraphs) - 1 else None
+        "previous": neighbors.get(target.position - 1),
+        "current": target,
+        "next": neighbors.get(target.position + 1)
     }
 
+# Window of a document's paragraphs by position, half-open [from, to)
+@router.get("/documents/{document_id}/paragraphs", response_model=list[ParagraphOut])
+def get_paragraph_range(document_id: int, start: int = Query(0, alias="from", ge=0),
+                        end: int | None = Query(None, alias="to", ge=0), db: Session = Depends(get_db)):
+    end = min(end if end is not None else start + 100, start + MAX_PARAGRAPH_WINDOW)
+    return db.query(models.Paragraph).filter(
+        models.Paragraph.document_id == document_id,
+        models.Paragraph.position >= start,
+        models.Paragraph.position < end,
+    ).order_by(models.Paragraph.position).all()
+
 @router.post("/llm_query", response_model=LLMQueryResponse)
-def general_llm_query(data: LLMQueryRequest):
-    return workflow.get_llm_response(data.prompt)
\ No newline at end of file
+async def general_llm_query(data: LLMQueryRequest):
+    return await workflow.get_llm_response(data.prompt)
+
+@router.post("/llm_query/stream")
+async def stream_general_llm_query(data: LLMQueryRequest):
+    deltas = workflow.stream_llm_response(data.prompt)
+    return StreamingResponse(sse_stream(deltas), media_type="text/event-stream")
+
+@router.get("/cache/stats")
+def cache_stats():
+    return get_cache().stats()
+
+
+@router.get("/llm/endpoints")
+def llm_endpoints():
+    return get_pool().stats()
+
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
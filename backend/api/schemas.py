@@ -1,5 +1,7 @@
 # backend/api/schemas.py
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel, Field
 
 class UploadRequest(BaseModel):
     name: str
@@ -16,13 +18,18 @@ class EditAcceptRequest(BaseModel):
 
 class GenerateRulesRequest(BaseModel):
     text: str
+    # Smaller windows would fan a policy out into one LLM call per handful of words
+    chunk_tokens: int | None = Field(None, ge=100)
 
 class GenerateRulesResponse(BaseModel):
     rules: list[str]
+    created: int | None = None
+    merged: int | None = None
 
 class ParagraphOut(BaseModel):
     id: int
     document_id: int
+    position: int | None = None
     content: str
 
     class Config:
@@ -45,3 +52,66 @@ class LLMQueryResponse(BaseModel):
     
 class FixSuggestionsRequest(BaseModel):
     violation_ids: list[int]
+    # "spans" replaces only the offending spans, "rewrite" the whole paragraph; FIX_MODE when None
+    mode: Literal["spans", "rewrite"] | None = None
+
+class DocumentCheckRequest(BaseModel):
+    rule_ids: list[int] | None = None
+    concurrency: int | None = Field(None, ge=1)
+    pack_size: int | None = Field(None, ge=1)
+    exhaustive: bool | None = None
+    top_k: int | None = Field(None, ge=1)
+    min_score: float | None = None
+
+class DocumentCheckResponse(BaseModel):
+    document_id: int
+    paragraphs: int
+    unique_paragraphs: int
+    rules: int
+    checks: int
+    up_to_date: int
+    skipped: int
+    evaluated: int
+    reused: int
+    dedup_ratio: float
+    violations_written: int
+    failed: int
+    elapsed_seconds: float
+
+class DocumentRecheckRequest(BaseModel):
+    concurrency: int | None = Field(None, ge=1)
+    pack_size: int | None = Field(None, ge=1)
+
+class DocumentRecheckResponse(BaseModel):
+    document_id: int
+    stale_pairs: int
+    rechecked: int
+    failed: int
+    elapsed_seconds: float
+
+class JobCreateRequest(BaseModel):
+    kind: str
+    payload: dict
+
+class JobStatusResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress_done: int
+    progress_total: int
+    eta_seconds: float | None
+    result: dict | None
+    error: str | None
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+class RuleCompactRequest(BaseModel):
+    threshold: float | None = Field(None, gt=0, le=1)
+    dry_run: bool = False
+
+class RuleCompactResponse(BaseModel):
+    groups: dict[str, list[int]]
+    removed: int
+    remaining: int
+    dry_run: bool
@@ -0,0 +1,99 @@
+# backend/benchmarks/bench_extract.py
+"""
+PDF extraction benchmark: single-process page-by-page extraction (what the
+Streamlit UI did) vs core.extract's process-pool page ranges. Re-uploads
+of the same file skip extraction entirely (text is cached by file hash).
+
+Run from backend/:  python -m benchmarks.bench_extract [--pages 1000] [--workers N]
+The fixture PDF is generated locally; no extra dependencies beyond pypdf.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_extract.db"
+
+from pypdf import PdfReader
+
+from core import extract
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 40):
+    """Minimal text-only PDF with Helvetica text lines on every page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = [
+            f"({'Clause %d.%d: the supplier shall notify the customer of any breach within %d hours.' % (page, i, i + 1)}) Tj T*"
+            for i in range(lines_per_page)
+        ]
+        stream = ("BT /F1 9 Tf 12 TL 40 780 Td " + " ".join(lines) + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def sequential(path: str) -> str:
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+async def pooled(extractor: extract.Extractor, path: str) -> str:
+    return "".join([block async for block in extractor.aiter_text(path, "pdf")])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_extract.pdf")
+    write_pdf(path, args.pages)
+    print(f"fixture: {args.pages} pages, {os.path.getsize(path) / 1024 / 1024:.1f} MB, {args.workers} workers")
+
+    started = time.perf_counter()
+    expected = sequential(path)
+    sequential_seconds = time.perf_counter() - started
+    print(f"{'sequential (old UI)':<24} {sequential_seconds:>8.2f}s")
+
+    extractor = extract.Extractor(workers=args.workers)
+    try:
+        # Start the worker processes outside the timed run
+        asyncio.run(pooled(extractor, path))
+        started = time.perf_counter()
+        text = asyncio.run(pooled(extractor, path))
+        pooled_seconds = time.perf_counter() - started
+    finally:
+        extractor.shutdown()
+    print(f"{'process pool':<24} {pooled_seconds:>8.2f}s   ({sequential_seconds / pooled_seconds:.1f}x)")
+    assert text.split() == expected.split(), "pooled extraction differs from sequential"
+
+
+if __name__ == "__main__":
+    main()
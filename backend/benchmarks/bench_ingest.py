@@ -0,0 +1,82 @@
+# backend/benchmarks/bench_ingest.py
+"""
+Ingestion benchmark: per-row ORM adds (the old /upload_for_checking and
+/generate_rules loops) vs the db.bulk executemany path, in rows/sec.
+
+Run from backend/:  python -m benchmarks.bench_ingest [--paragraphs 5000] [--rules 200]
+Uses DATABASE_URL if set (point it at a scratch Postgres), else a temporary SQLite file.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import bulk, models
+
+
+def orm_paragraphs(db, paragraphs):
+    doc = models.Document(name="bench", content="\n".join(paragraphs))
+    db.add(doc)
+    db.commit()
+    db.refresh(doc)
+    for para in paragraphs:
+        db.add(models.Paragraph(document_id=doc.id, content=para))
+    db.commit()
+
+
+def bulk_paragraphs(db, paragraphs):
+    bulk.insert_document(db, "bench", "\n".join(paragraphs), paragraphs)
+    db.commit()
+
+
+def orm_rules(db, rules):
+    for i, rule in enumerate(rules):
+        rule_obj = models.ComplianceRule(name=f"Rule {i+1}", description=rule)
+        db.add(rule_obj)
+        db.commit()
+        db.refresh(rule_obj)
+
+
+def bulk_rules(db, rules):
+    bulk.insert_rules(db, rules)
+    db.commit()
+
+
+def timed(SessionLocal, fn, rows):
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        fn(db, rows)
+        return time.perf_counter() - started
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--rules", type=int, default=200)
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/bench_ingest.db"
+    engine = create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    paragraphs = [f"Clause {i}: the supplier shall retain records for {i % 10 + 1} years." for i in range(args.paragraphs)]
+    rules = [f"Records must be retained for at least {i % 10 + 1} years (variant {i})." for i in range(args.rules)]
+
+    print(f"database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{'workload':<22} {'rows':>7} {'orm rows/s':>12} {'bulk rows/s':>12} {'speedup':>8}")
+    for name, rows, orm_fn, bulk_fn in (("document+paragraphs", paragraphs, orm_paragraphs, bulk_paragraphs),
+                                        ("rules", rules, orm_rules, bulk_rules)):
+        orm_s = timed(SessionLocal, orm_fn, rows)
+        bulk_s = timed(SessionLocal, bulk_fn, rows)
+        print(f"{name:<22} {len(rows):>7} {len(rows) / orm_s:>12.0f} {len(rows) / bulk_s:>12.0f} {orm_s / bulk_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
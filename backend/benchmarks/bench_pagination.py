@@ -0,0 +1,87 @@
+# backend/benchmarks/bench_pagination.py
+"""
+Read-path benchmark on a 50k-paragraph fixture: the old unbounded ORM
+/document_paragraphs response vs keyset pages (full and projected columns).
+Reports latency and response size per request, plus a full paginated walk.
+
+Run from backend/:  python -m benchmarks.bench_pagination [--paragraphs 50000] [--page 1000]
+Uses DATABASE_URL if set (point it at a scratch Postgres), else a temporary SQLite file.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_pagination.db"
+
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from main import app
+from api.routes import get_db
+from db import bulk, models, session
+
+
+@app.get("/_bench/document_paragraphs_orm")
+def legacy_get_paragraphs(doc_id: int, db: Session = Depends(get_db)):
+    """The pre-pagination handler, mounted for comparison only."""
+    return db.query(models.Paragraph).filter(models.Paragraph.document_id == doc_id).all()
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, default=50000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    db = session.SessionLocal()
+    document_id, _ = bulk.insert_document(db, "bench", None, [
+        f"Clause {i}: the supplier shall notify the customer of any data breach within {i % 72 + 1} hours."
+        for i in range(args.paragraphs)
+    ])
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    cases = (
+        ("orm .all() (old)", "/_bench/document_paragraphs_orm", {"doc_id": document_id}),
+        ("keyset page", "/document_paragraphs", {"doc_id": document_id, "limit": args.page}),
+        ("keyset page id,content", "/document_paragraphs",
+         {"doc_id": document_id, "limit": args.page, "fields": "id,content"}),
+    )
+    print(f"fixture: {args.paragraphs} paragraphs on {session.engine.url.render_as_string(hide_password=True)}")
+    print(f"{'request':<24} {'ms':>9} {'KB':>9}")
+    for name, path, params in cases:
+        seconds, response = best_of(lambda: client.get(path, params=params), args.repeat)
+        print(f"{name:<24} {seconds * 1000:>9.1f} {len(response.content) / 1024:>9.1f}")
+
+    def walk():
+        after, pages = None, 0
+        while True:
+            params = {"doc_id": document_id, "limit": args.page}
+            if after is not None:
+                params["after"] = after
+            response = client.get("/document_paragraphs", params=params)
+            pages += 1
+            after = response.headers.get("X-Next-Cursor")
+            if after is None:
+                return pages
+
+    seconds, pages = best_of(walk, args.repeat)
+    print(f"{'full keyset walk':<24} {seconds * 1000:>9.1f}   ({pages} pages)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# backend/benchmarks/bench_scenarios.py
+"""
+Load scenarios against the FastAPI app, reporting p50/p95/p99 latency and
+requests/sec per endpoint.
+
+  upload     concurrent /upload_for_checking of synthetic documents
+  check      rule generation, then one /documents/{id}/check over a large document
+  reviewers  concurrent reviewers looping neighbors -> check_violation -> suggest_fix -> accept_edit
+
+By default the app runs in-process against the mock LLM (benchmarks.mock_llm)
+with no sockets, so results are reproducible offline. Pass --base-url to
+load a running API instead (start the mock with `python -m benchmarks.mock_llm`
+and point the API's OWUI_BASE_URL at it).
+
+Run from backend/:  python -m benchmarks.bench_scenarios [--scenario all] [--llm-latency 0.2]
+Uses DATABASE_URL if set (point it at a scratch Postgres), else a temporary SQLite file.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_scenarios.db"
+# Measure the pipeline, not cache hits from an earlier run against the same database
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+import httpx
+
+from benchmarks import mock_llm, synthetic
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    """Latencies and failures per request name over one scenario."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            raise
+        self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, title: str):
+        elapsed = time.perf_counter() - self.started
+        print(f"\n== {title} ({elapsed:.2f}s)")
+        print(f"{'request':<26} {'count':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+        for name, values in self.latencies.items():
+            values = sorted(values)
+            print(f"{name:<26} {len(values):>6} {self.errors[name]:>5} "
+                  f"{percentile(values, 50) * 1000:>9.1f} {percentile(values, 95) * 1000:>9.1f} "
+                  f"{percentile(values, 99) * 1000:>9.1f} {len(values) / elapsed:>8.1f}")
+
+
+async def upload_scenario(client, args):
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def upload(i):
+        async with semaphore:
+            text = synthetic.document(args.upload_paragraphs, seed=args.seed + i)
+            await recorder.request(client, "upload_for_checking", "POST", "/upload_for_checking",
+                                   json={"name": f"bench-{i}", "content": text})
+
+    await asyncio.gather(*(upload(i) for i in range(args.uploads)))
+    recorder.report(f"upload: {args.uploads} documents x {args.upload_paragraphs} paragraphs, "
+                    f"{args.concurrency} concurrent")
+
+
+async def seed_rules(client, recorder, args) -> list[int]:
+    await recorder.request(client, "generate_rules", "POST", "/generate_rules",
+                           json={"text": synthetic.policy_text(args.rules, seed=args.seed)})
+    response = await client.get("/rules", params={"fields": "id", "limit": 10000})
+    return [row["id"] for row in response.json()]
+
+
+async def check_scenario(client, args):
+    recorder = Recorder()
+    rule_ids = await seed_rules(client, recorder, args)
+    response = await recorder.request(client, "upload_for_checking", "POST", "/upload_for_checking", json={
+        "name": "bench-check", "content": synthetic.document(args.check_paragraphs, seed=args.seed + 10_000),
+    })
+    document_id = response.json()["document_id"]
+
+    response = await recorder.request(client, "documents/check", "POST", f"/documents/{document_id}/check",
+                                      json={"rule_ids": rule_ids}, timeout=None)
+    recorder.report(f"check: {args.check_paragraphs} paragraphs x {len(rule_ids)} rules")
+    summary = response.json()
+    elapsed = recorder.latencies["documents/check"][-1]
+    print(f"evaluated {summary.get('evaluated')} LLM checks of {summary.get('checks')} pairs "
+          f"({summary.get('evaluated', 0) / elapsed:.1f} checks/s, {summary.get('failed')} failed)")
+
+
+async def reviewers_scenario(client, args):
+    recorder = Recorder()
+    rule_ids = await seed_rules(client, recorder, args)
+    response = await client.post("/upload_for_checking", json={
+        "name": "bench-review", "content": synthetic.document(args.reviewers * args.iterations, seed=args.seed + 20_000),
+    })
+    document_id = response.json()["document_id"]
+    page = await client.get("/document_paragraphs", params={"doc_id": document_id, "fields": "id", "limit": 10000})
+    paragraph_ids = [row["id"] for row in page.json()]
+
+    async def reviewer(r):
+        for i in range(args.iterations):
+            paragraph_id = paragraph_ids[(r * args.iterations + i) % len(paragraph_ids)]
+            rule_id = rule_ids[(r + i) % len(rule_ids)]
+            await recorder.request(client, "paragraph_with_neighbors", "GET",
+                                   f"/paragraph_with_neighbors/{paragraph_id}")
+            check = await recorder.request(client, "check_violation", "POST", "/check_violation",
+                                           json={"rule_id": rule_id, "paragraph_id": paragraph_id})
+            violation_id = check.json()["violation_id"]
+            fix = await recorder.request(client, "suggest_fix", "POST", "/suggest_fix",
+                                         json={"violation_ids": [violation_id]})
+            await recorder.request(client, "accept_edit", "POST", "/accept_edit", json={
+                "violation_id": violation_id, "new_text": fix.json()["suggested_fix"], "accepted": True,
+            })
+
+    await asyncio.gather(*(reviewer(r) for r in range(args.reviewers)))
+    recorder.report(f"reviewers: {args.reviewers} concurrent x {args.iterations} iterations")
+
+
+SCENARIOS = {"upload": upload_scenario, "check": check_scenario, "reviewers": reviewers_scenario}
+
+
+async def run(args):
+    # Injected errors would otherwise log a retry warning per call
+    logging.getLogger("core").setLevel(logging.ERROR)
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=300)
+        target = args.base_url
+    else:
+        from main import app
+
+        mock_llm.install(mock_llm.MockLLMConfig(
+            latency=args.llm_latency, tokens_per_second=args.llm_tokens_per_second,
+            error_rate=args.llm_error_rate, error_status=args.llm_error_status, seed=args.seed,
+        ))
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+        target = f"in-process app, mock LLM {args.llm_latency * 1000:.0f} ms, {os.environ['DATABASE_URL']}"
+
+    print(f"target: {target}")
+    async with client:
+        for name in (SCENARIOS if args.scenario == "all" else [args.scenario]):
+            await SCENARIOS[name](client, args)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    parser.add_argument("--base-url", help="Load a running API instead of the in-process app")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--upload-paragraphs", type=int, default=500)
+    parser.add_argument("--rules", type=int, default=20)
+    parser.add_argument("--check-paragraphs", type=int, default=500)
+    parser.add_argument("--reviewers", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-status", type=int, default=503)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# backend/benchmarks/bench_segment.py
+"""
+Segmentation benchmark on PDF-like text (hard-wrapped lines, headings,
+lettered lists, page numbers): the old split-on-every-newline vs the
+streaming Segmenter. Reports throughput and how many paragraphs (i.e. DB
+rows and LLM checks) each produces.
+
+Run from backend/:  python -m benchmarks.bench_segment [--clauses 50000] [--width 80]
+"""
+import argparse
+import random
+import textwrap
+import time
+
+from benchmarks import synthetic
+from core import parser
+
+
+def pdf_like_text(clauses: int, width: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for i, paragraph in enumerate(synthetic.paragraphs(clauses, seed, duplicate_ratio=0)):
+        if i % 40 == 0:
+            lines.append(f"Section {i // 40 + 1} Operational Controls")
+        if i % 25 == 0:
+            lines.append(f"{i // 25 + 1}.{i % 7 + 1} The supplier shall:")
+            lines.extend(f"({letter}) {rng.choice(synthetic.OBLIGATIONS).format(n=3)};" for letter in "abc")
+        body = f"{paragraph} {rng.choice(synthetic.FILLER)} {rng.choice(synthetic.FILLER)}"
+        lines.extend(textwrap.wrap(body, width))
+        if i % 60 == 59:
+            lines.append(str(i // 60 + 1))
+        if rng.random() < 0.5:
+            lines.append("")
+    return "\n".join(lines)
+
+
+def old_split(text: str) -> list[str]:
+    return [p.strip() for p in text.split('\n') if p.strip()]
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    argp = argparse.ArgumentParser()
+    argp.add_argument("--clauses", type=int, default=50000)
+    argp.add_argument("--width", type=int, default=80)
+    argp.add_argument("--repeat", type=int, default=3)
+    args = argp.parse_args()
+
+    text = pdf_like_text(args.clauses, args.width)
+    megabytes = len(text.encode("utf-8")) / 1024 / 1024
+    # Feed the segmenter the way extraction does: in blocks, not one string
+    blocks = [text[i:i + 64 * 1024] for i in range(0, len(text), 64 * 1024)]
+    print(f"fixture: {megabytes:.1f} MB, {text.count(chr(10)) + 1} lines")
+    print(f"{'splitter':<22} {'s':>7} {'MB/s':>8} {'paragraphs':>11} {'avg tokens':>11}")
+    cases = (
+        ("split on newline (old)", lambda: old_split(text)),
+        ("Segmenter (streaming)", lambda: list(parser.iter_paragraphs(blocks))),
+    )
+    for name, fn in cases:
+        seconds, paragraphs = best_of(fn, args.repeat)
+        average = sum(parser.estimate_tokens(p) for p in paragraphs) / len(paragraphs)
+        print(f"{name:<22} {seconds:>7.2f} {megabytes / seconds:>8.1f} {len(paragraphs):>11} {average:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# backend/benchmarks/bench_sse.py
+"""
+Micro-benchmark: incremental SSE decoder (core.sse) vs the buffered
+clean_your_string it replaced, on multi-megabyte synthetic responses.
+
+Run from backend/:  python -m benchmarks.bench_sse [--mb 4 8 16] [--chunk 16384]
+"""
+import argparse
+import json
+import re
+import time
+import tracemalloc
+
+from core import sse
+
+
+def clean_your_string(text_str):
+    """The pre-core.sse implementation, kept verbatim as the baseline."""
+    results = []
+    for line in text_str.splitlines():
+        line = line.strip()
+        if line.startswith('data: ') and line != 'data: [DONE]':
+            try:
+                json_str = line.replace('data: ', '', 1)
+                parsed = json.loads(json_str)
+                content = parsed['choices'][0]['delta'].get('content')
+                if content:
+                    results.append(content)
+            except json.JSONDecodeError as e:
+                print(f"Failed to decode line: {line}\nError: {e}")
+
+    full_content = ''.join(results)
+    content = re.sub(r'^```json\n|```$', '', full_content.strip(), flags=re.MULTILINE)
+
+    return content
+
+
+def make_stream(megabytes: float) -> bytes:
+    words = "the supplier shall encrypt all personal data in transit and at rest ".split(" ")
+    events = []
+    size = 0
+    i = 0
+    while size < megabytes * 1024 * 1024:
+        event = "data: " + json.dumps({"choices": [{"delta": {"content": words[i % len(words)] + " "}}]}) + "\n\n"
+        events.append(event)
+        size += len(event)
+        i += 1
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode("utf-8")
+
+
+def measure(fn, repeat: int = 3):
+    """Best-of-`repeat` wall time, then peak allocation in a separate traced run."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = min(elapsed, time.perf_counter() - started)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, nargs="+", default=[4, 16])
+    parser.add_argument("--chunk", type=int, default=16 * 1024, help="network chunk size in bytes")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'impl':<18} {'seconds':>8} {'MB/s':>8} {'peak MB':>8}")
+    for mb in args.mb:
+        body = make_stream(mb)
+        chunks = [body[i:i + args.chunk] for i in range(0, len(body), args.chunk)]
+
+        # The legacy path needs the whole body decoded to one str first
+        legacy, legacy_s, legacy_peak = measure(lambda: clean_your_string(b"".join(chunks).decode("utf-8")))
+        current, current_s, current_peak = measure(lambda: sse.collect(chunks))
+        assert legacy == current, "decoders disagree"
+
+        size = len(body) / 1024 / 1024
+        for name, seconds, peak in (("clean_your_string", legacy_s, legacy_peak),
+                                    ("sse.collect", current_s, current_peak)):
+            print(f"{size:>7.1f}M {name:<18} {seconds:>8.3f} {size / seconds:>8.1f} {peak / 1024 / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# backend/benchmarks/mock_llm.py
+"""
+Mock OpenAI-compatible inference server for benchmarks.
+
+Serves POST /api/chat/completions (plain JSON or SSE when "stream" is set)
+and GET /health with configurable latency, streaming speed and error
+injection. Answers are shaped by the prompt so the app's parsers see
+realistic output: packed checks get a JSON verdict array, single checks a
+verdict quoting the paragraph, rule extraction a rule list, span fixes a
+JSON replacement array and rewrites a rewritten paragraph.
+
+Standalone (point OWUI_BASE_URL or LLM_ENDPOINTS at it):
+    python -m benchmarks.mock_llm --port 9100 --latency 0.5 --error-rate 0.01
+In-process (no sockets), as used by bench_scenarios:
+    mock_llm.install(MockLLMConfig(latency=0.2))
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from benchmarks import synthetic
+from core import llm_client
+
+
+class MockLLMConfig:
+    """
+    Args:
+        latency: Mean seconds before the first byte.
+        jitter: Latency is drawn uniformly from latency * (1 ± jitter).
+        tokens_per_second: Streaming speed; 0 sends every token at once.
+        error_rate: Share of requests answered with `error_status`.
+        error_status: Status for injected errors (429 adds Retry-After).
+        retry_after: Retry-After seconds sent with injected 429s.
+        violation_rate: Share of (paragraph, rule) checks reported as violations.
+        rules_per_extraction: Rules returned per rule-extraction prompt.
+        seed: Seed for latency and error draws.
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.5, tokens_per_second: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, retry_after: float = 1.0,
+                 violation_rate: float = 0.2, rules_per_extraction: int = 20, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.violation_rate = violation_rate
+        self.rules_per_extraction = rules_per_extraction
+        self.seed = seed
+
+
+def _violated(config: MockLLMConfig, *parts: str) -> bool:
+    # Stable per (paragraph, rule) so packed and single checks agree
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32 < config.violation_rate
+
+
+def _paragraph_of(prompt: str) -> str:
+    return prompt.rsplit("Paragraph:", 1)[-1].strip() if "Paragraph:" in prompt else prompt.rsplit("\n\n", 1)[-1]
+
+
+def reply_for(prompt: str, config: MockLLMConfig) -> str:
+    if "For each numbered rule" in prompt:
+        paragraph = _paragraph_of(prompt)
+        rule_section = prompt.split("Rules:", 1)[-1].split("Paragraph:", 1)[0]
+        verdicts = []
+        for number, rule in re.findall(r"^\s*(\d+)\.\s*(.+)$", rule_section, flags=re.MULTILINE):
+            violated = _violated(config, paragraph, rule)
+            verdicts.append({
+                "rule": int(number),
+                "violated": violated,
+                "problematic_text": f"'{paragraph[:60]}' conflicts with: {rule}" if violated else "",
+            })
+        return json.dumps(verdicts)
+    if "You are given a rule and a paragraph" in prompt:
+        rule = prompt.split("Rule: ", 1)[-1].split("\n", 1)[0]
+        paragraph = _paragraph_of(prompt)
+        if _violated(config, paragraph, rule):
+            return f'Yes. The text "{paragraph[:60]}" violates the rule.'
+        return "No violation found."
+    if "extract a concise list of explicit compliance rules" in prompt:
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:4], "big")
+        return "\n".join(synthetic.rules(config.rules_per_extraction, seed))
+    if "Each numbered passage" in prompt:
+        passage_section = prompt.split("Passages:", 1)[-1].split("Paragraph:", 1)[0]
+        numbers = re.findall(r"^(\d+)\.", passage_section, flags=re.MULTILINE)
+        return json.dumps([
+            {"passage": int(number), "replacement": "This is handled in line with the applicable policy."}
+            for number in numbers
+        ])
+    if "Rewrite the paragraph" in prompt:
+        return f"{_paragraph_of(prompt)} This is handled in line with the applicable policy."
+    return f"Mock answer to a {len(prompt)}-character prompt."
+
+
+def create_app(config: MockLLMConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+
+    @app.get("/health")
+    async def health():
+        return {"status": True}
+
+    @app.post("/api/chat/completions")
+    async def completions(request: Request):
+        payload = await request.json()
+        prompt = "\n\n".join(
+            content if isinstance(content, str) else " ".join(
+                part.get("text", "") for part in content if isinstance(part, dict)
+            )
+            for content in (message.get("content", "") for message in payload.get("messages") or [])
+        )
+
+        await asyncio.sleep(max(0.0, config.latency * (1 + config.jitter * (2 * rng.random() - 1))))
+        if rng.random() < config.error_rate:
+            headers = {"Retry-After": str(config.retry_after)} if config.error_status == 429 else {}
+            return Response("injected error", status_code=config.error_status, headers=headers)
+
+        text = reply_for(prompt, config)
+        if not payload.get("stream"):
+            return JSONResponse({
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+            })
+
+        async def events():
+            for token in re.findall(r"\S+\s*", text):
+                if config.tokens_per_second:
+                    await asyncio.sleep(1 / config.tokens_per_second)
+                yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': token}}]})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def install(config: MockLLMConfig) -> FastAPI:
+    """Route the app's shared LLM client to an in-process mock server."""
+    app = create_app(config)
+    llm_client.set_client(llm_client.LLMClient(
+        "http://mock-llm", max_concurrency=1024, transport=httpx.ASGITransport(app=app)
+    ))
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--violation-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockLLMConfig(
+        latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after,
+        violation_rate=args.violation_rate,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
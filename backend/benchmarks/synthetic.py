@@ -0,0 +1,87 @@
+# backend/benchmarks/synthetic.py
+"""
+Deterministic synthetic compliance data for benchmarks: rules, policy
+text to extract them from, and documents whose paragraphs touch (and
+sometimes break) those rules.
+"""
+import random
+
+SUBJECTS = (
+    "customer data", "payment records", "access logs", "backups", "employee files", "API keys",
+    "audit trails", "support tickets", "medical records", "vendor contracts", "source code", "laptops",
+)
+OBLIGATIONS = (
+    "must be encrypted at rest", "must be retained for at least {n} years", "must not be shared with third parties",
+    "must be reviewed every {n} months", "must be deleted within {n} days of a request", "must be stored in the EU",
+    "must only be accessed over VPN", "must be approved by the security officer", "must be logged and monitored",
+    "must be protected by multi-factor authentication",
+)
+FILLER = (
+    "The team reviewed the process during the quarterly planning session.",
+    "This section describes how the service is operated day to day.",
+    "Responsibilities are shared between engineering and operations.",
+    "Exceptions are documented in the internal wiki and revisited yearly.",
+    "The workflow was introduced to reduce manual handoffs between teams.",
+)
+VIOLATIONS = (
+    "{subject} are currently kept in plain text on a shared drive.",
+    "We email {subject} to partners when they ask for them.",
+    "{subject} have not been reviewed since the system was launched.",
+    "Anyone in the office can open {subject} without signing in.",
+)
+
+
+def rules(count: int, seed: int = 0) -> list[str]:
+    """`count` distinct one-sentence rules."""
+    rng = random.Random(seed)
+    result = []
+    seen = set()
+    while len(result) < count:
+        subject = rng.choice(SUBJECTS)
+        obligation = rng.choice(OBLIGATIONS).format(n=rng.randint(1, 12))
+        rule = f"{subject[0].upper()}{subject[1:]} {obligation}."
+        if rule not in seen:
+            seen.add(rule)
+            result.append(rule)
+        elif len(seen) >= len(SUBJECTS) * len(OBLIGATIONS) * 12:
+            result.append(f"{rule[:-1]} (clause {len(result) + 1}).")
+    return result
+
+
+def policy_text(rule_count: int, seed: int = 0) -> str:
+    """A policy document stating `rule_count` rules among filler sentences, one per line."""
+    rng = random.Random(seed)
+    lines = []
+    for rule in rules(rule_count, seed):
+        lines.append(rule)
+        if rng.random() < 0.5:
+            lines.append(rng.choice(FILLER))
+    return "\n".join(lines)
+
+
+def paragraphs(count: int, seed: int = 0, violation_ratio: float = 0.2,
+               duplicate_ratio: float = 0.1) -> list[str]:
+    """
+    Document paragraphs: mostly neutral prose, `violation_ratio` of them
+    describing a practice that breaks a rule, and `duplicate_ratio` repeating
+    an earlier paragraph verbatim (boilerplate).
+    """
+    rng = random.Random(seed)
+    result = []
+    for i in range(count):
+        if result and rng.random() < duplicate_ratio:
+            result.append(rng.choice(result))
+            continue
+        subject = rng.choice(SUBJECTS)
+        if rng.random() < violation_ratio:
+            sentence = rng.choice(VIOLATIONS).format(subject=subject)
+            sentence = sentence[0].upper() + sentence[1:]
+        else:
+            sentence = f"Paragraph {i} covers how {subject} are handled. {rng.choice(FILLER)}"
+        result.append(sentence)
+    return result
+
+
+def document(count: int, seed: int = 0, **kwargs) -> str:
+    """`paragraphs(count, seed, ...)` as upload text, one paragraph per line."""
+    return "\n".join(paragraphs(count, seed, **kwargs))
@@ -0,0 +1,158 @@
+# backend/core/cache.py
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from time import monotonic
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import models, session
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts: str) -> str:
+    """Content address for an LLM result: sha256 over the parts that determine it."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM results: an in-process LRU in front of the
+    `llm_cache` table. Entries expire after `ttl_seconds`; the LRU holds at
+    most `max_memory_items` and the table is pruned to `max_rows` (oldest
+    first) every `prune_every` writes.
+    """
+
+    def __init__(self, session_factory=session.SessionLocal, max_memory_items: int = 10000,
+                 ttl_seconds: int = 30 * 24 * 3600, max_rows: int = 500000,
+                 prune_every: int = 1000, enabled: bool = True):
+        self._session_factory = session_factory
+        self._memory = OrderedDict()
+        self.max_memory_items = max_memory_items
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self.enabled = enabled
+        self._writes = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = (value, monotonic() + self.ttl_seconds)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _db_get(self, key: str) -> str | None:
+        db = self._session_factory()
+        try:
+            entry = db.get(models.LLMCacheEntry, key)
+            if entry is None:
+                return None
+            if entry.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+                db.delete(entry)
+                db.commit()
+                return None
+            return entry.value
+        finally:
+            db.close()
+
+    def _db_set(self, key: str, kind: str, value: str):
+        db = self._session_factory()
+        try:
+            db.merge(models.LLMCacheEntry(key=key, kind=kind, value=value, created_at=datetime.utcnow()))
+            db.commit()
+        except SQLAlchemyError as e:
+            # A concurrent writer stored the same key first; its value is equivalent.
+            db.rollback()
+            logger.debug("LLM cache write skipped for %s: %s", key, e)
+        finally:
+            db.close()
+
+    def _db_prune(self):
+        db = self._session_factory()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            db.query(models.LLMCacheEntry).filter(models.LLMCacheEntry.created_at < cutoff).delete()
+            overflow = db.query(models.LLMCacheEntry).count() - self.max_rows
+            if overflow > 0:
+                oldest = db.query(models.LLMCacheEntry.key).order_by(
+                    models.LLMCacheEntry.created_at
+                ).limit(overflow).subquery()
+                db.query(models.LLMCacheEntry).filter(
+                    models.LLMCacheEntry.key.in_(oldest.select())
+                ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        cached = self._memory.get(key)
+        if cached is not None:
+            value, expires_at = cached
+            if expires_at > monotonic():
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._memory[key]
+
+        try:
+            value = await asyncio.to_thread(self._db_get, key)
+        except SQLAlchemyError as e:
+            logger.warning("LLM cache lookup failed, treating as miss: %s", e)
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        self._remember(key, value)
+        return value
+
+    async def set(self, key: str, kind: str, value: str):
+        if not self.enabled:
+            return
+        self._remember(key, value)
+        await asyncio.to_thread(self._db_set, key, kind, value)
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            await asyncio.to_thread(self._db_prune)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+
+def cache_from_env() -> LLMCache:
+    return LLMCache(
+        max_memory_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS") or "10000"),
+        ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS") or str(30 * 24 * 3600)),
+        max_rows=int(os.getenv("LLM_CACHE_MAX_ROWS") or "500000"),
+        enabled=(os.getenv("LLM_CACHE_ENABLED") or "true").lower() == "true",
+    )
+
+
+_cache: LLMCache | None = None
+
+
+def get_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        _cache = cache_from_env()
+    return _cache
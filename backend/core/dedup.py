@@ -0,0 +1,143 @@
+# backend/core/dedup.py
+import hashlib
+import math
+import re
+from collections import defaultdict
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop list markers/punctuation and collapse whitespace."""
+    text = re.sub(r"^\s*(?:[-*•]|\d+[.)]|rule\s+\d+[:.)])\s*", "", text.strip(), flags=re.IGNORECASE)
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def _feature_order(feature: str) -> bytes:
+    # Any fixed total order works for prefix filtering; a hash spreads common features out
+    return hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+
+
+def shingles(text: str, n: int = 3) -> set[str]:
+    """Word n-grams of the normalized text (the whole text when shorter than n words)."""
+    words = normalize(text).split()
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+# Articles, modals, copulas and prepositions that rephrasings add or drop freely
+_STOPWORDS = frozenset("""
+a an the all any each every this that these those its their our your
+must shall should will may can be is are been being has have
+in on at of to for with by from into within while during and or as
+""".split())
+_NEGATIONS = frozenset({"not", "no", "never", "nor", "cannot"})
+
+
+def terms(text: str) -> set[str]:
+    """
+    Content words of the normalized text (all of its words when it has no
+    content words). In a negated rule every term is marked, so "must not"
+    and "must" rules share no terms at all.
+    """
+    words = normalize(text).split()
+    negated = any(word in _NEGATIONS for word in words)
+    content = {word for word in words if word not in _STOPWORDS and word not in _NEGATIONS} or set(words)
+    return {f"!{word}" for word in content} if negated else content
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class RuleIndex:
+    """
+    Incremental near-duplicate index over rule texts.
+
+    Rules are compared as sets of features, by default their content words
+    (see terms), so rephrasings such as "All user data must be encrypted in
+    transit." and "User data must be encrypted while in transit." match at
+    the default 0.8, while rules differing in a content word ("Backups..." vs
+    "Laptops must be encrypted at rest.", 0.5) do not.
+
+    Uses prefix filtering: with features in a fixed global order, two sets
+    with Jaccard similarity >= t must share a feature within the first
+    |s| - ceil(t * |s|) + 1 features of each. Only those prefix features are
+    indexed and probed, so each lookup touches a handful of candidates, which
+    are then confirmed with exact Jaccard similarity.
+    """
+
+    def __init__(self, threshold: float = 0.8, features=terms):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Similarity threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.features = features
+        self._postings = defaultdict(set)
+        self._sets = {}
+        self._order = {}
+
+    def _prefix(self, rule_features: set[str]) -> list[str]:
+        ordered = sorted(rule_features, key=_feature_order)
+        return ordered[:len(ordered) - math.ceil(self.threshold * len(ordered)) + 1]
+
+    def find(self, text: str):
+        """Key of the most similar indexed rule that `text` near-duplicates, or None."""
+        rule_features = self.features(text)
+        if not rule_features:
+            return None
+        candidates = set()
+        for feature in self._prefix(rule_features):
+            candidates |= self._postings.get(feature, set())
+        best, best_score = None, 0.0
+        # Ties go to the earliest indexed rule; keys may be of any hashable type
+        for key in sorted(candidates, key=self._order.__getitem__):
+            score = jaccard(rule_features, self._sets[key])
+            if score >= self.threshold and score > best_score:
+                best, best_score = key, score
+        return best
+
+    def add(self, key, text: str):
+        rule_features = self.features(text)
+        if not rule_features:
+            return
+        self._sets[key] = rule_features
+        self._order.setdefault(key, len(self._order))
+        for feature in self._prefix(rule_features):
+            self._postings[feature].add(key)
+
+
+def find_duplicate_groups(rules: list[tuple[int, str]], threshold: float = 0.8) -> dict[int, list[int]]:
+    """
+    Group near-duplicate rules. Rules are visited in id order and each is
+    attached to the first earlier rule it duplicates.
+
+    Returns:
+        dict[int, list[int]]: canonical rule id -> ids of its duplicates (only groups with duplicates).
+    """
+    index = RuleIndex(threshold)
+    groups = defaultdict(list)
+    for rule_id, text in sorted(rules):
+        canonical = index.find(text)
+        if canonical is None:
+            index.add(rule_id, text)
+        else:
+            groups[canonical].append(rule_id)
+    return dict(groups)
+
+
+def dedupe_rules(rules: list[str], threshold: float = 0.8) -> list[str]:
+    """
+    Drop rules whose word-shingle Jaccard similarity to an earlier rule is at
+    least `threshold`, keeping the first phrasing seen.
+    """
+    index = RuleIndex(threshold, features=shingles)
+    kept = []
+    for i, rule in enumerate(rules):
+        if not shingles(rule) or index.find(rule) is not None:
+            continue
+        index.add(i, rule)
+        kept.append(rule)
+    return kept
@@ -0,0 +1,255 @@
+# backend/core/endpoints.py
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from time import monotonic
+
+import httpx
+
+from core.llm_client import LLMClient, client_from_env, get_client
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class Endpoint:
+    """
+    One inference server in the pool, with its own connection pool and health state.
+
+    `model` and `api_key` override the ones in the request when set, so
+    servers exposing the same model under different names can share a pool.
+    Every endpoint of a pool must serve the same model: requests are routed
+    to any of them, and cached answers are shared between them.
+    An endpoint without a `url` uses the process-wide client from llm_client.
+    """
+
+    def __init__(self, url: str | None = None, model: str | None = None, weight: float = 1.0,
+                 api_key: str | None = None, client: LLMClient | None = None):
+        self.url = url
+        self.model = model
+        self.weight = max(weight, 0.01)
+        self.api_key = api_key
+        self._client = client
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: float | None = None
+        self.state = CLOSED
+        self.open_until = 0.0
+
+    @property
+    def client(self) -> LLMClient:
+        if self._client is None and self.url:
+            self._client = client_from_env(self.url)
+        return self._client or get_client()
+
+    @property
+    def name(self) -> str:
+        return self.url or self.client.base_url
+
+    def available(self, now: float) -> bool:
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            # One trial request at a time decides whether the breaker closes again
+            return self.outstanding == 0
+        return self.state == CLOSED
+
+    def stats(self) -> dict:
+        return {
+            "url": self.name,
+            "model": self.model,
+            "weight": self.weight,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ewma_seconds": round(self.latency_ewma, 4) if self.latency_ewma is not None else None,
+        }
+
+
+class EndpointPool:
+    """
+    Routes LLM requests across several inference servers.
+
+    Picks the available endpoint with the fewest outstanding requests per
+    unit of weight (ties go to the lower latency EWMA). After
+    `failure_threshold` consecutive failures an endpoint's circuit breaker
+    opens for `cooldown` seconds; then a single trial request (or a passing
+    health check) closes it again.
+    """
+
+    def __init__(self, endpoints: list[Endpoint], failure_threshold: int = 3, cooldown: float = 30.0,
+                 ewma_alpha: float = 0.2):
+        if not endpoints:
+            raise ValueError("At least one LLM endpoint is required")
+        self.endpoints = endpoints
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.ewma_alpha = ewma_alpha
+
+    def pick(self, exclude=()) -> Endpoint | None:
+        """Best endpoint not in `exclude`, or None if every endpoint has been excluded."""
+        now = monotonic()
+        candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+        if not candidates:
+            return None
+        available = [endpoint for endpoint in candidates if endpoint.available(now)]
+        if not available:
+            # Everything is tripped: try the endpoint whose breaker reopens first
+            return min(candidates, key=lambda endpoint: endpoint.open_until)
+        return min(available, key=lambda endpoint: (
+            (endpoint.outstanding + 1) / endpoint.weight,
+            endpoint.latency_ewma or 0.0,
+        ))
+
+    def record_success(self, endpoint: Endpoint, latency: float):
+        endpoint.consecutive_failures = 0
+        if endpoint.state != CLOSED:
+            logger.info("LLM endpoint %s recovered", endpoint.name)
+        endpoint.state = CLOSED
+        if endpoint.latency_ewma is None:
+            endpoint.latency_ewma = latency
+        else:
+            endpoint.latency_ewma += self.ewma_alpha * (latency - endpoint.latency_ewma)
+
+    def record_failure(self, endpoint: Endpoint):
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.state == HALF_OPEN or endpoint.consecutive_failures >= self.failure_threshold:
+            if endpoint.state != OPEN:
+                logger.warning("LLM endpoint %s marked down for %gs", endpoint.name, self.cooldown)
+            endpoint.state = OPEN
+            endpoint.open_until = monotonic() + self.cooldown
+
+    @asynccontextmanager
+    async def track(self, endpoint: Endpoint, is_failure=lambda error: True):
+        """Count a request against `endpoint` and feed its outcome into latency and breaker state."""
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        started = monotonic()
+        try:
+            yield endpoint
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure(endpoint)
+            raise
+        else:
+            self.record_success(endpoint, monotonic() - started)
+        finally:
+            endpoint.outstanding -= 1
+
+    async def check_health(self, path: str = "/health"):
+        """Probe endpoints whose breaker is open so they rejoin as soon as they answer."""
+        for endpoint in self.endpoints:
+            if endpoint.state == CLOSED:
+                continue
+            try:
+                response = await endpoint.client.get(path)
+                healthy = response.status_code < 500
+            except httpx.HTTPError:
+                healthy = False
+            if healthy:
+                self.record_success(endpoint, endpoint.latency_ewma or 0.0)
+            else:
+                endpoint.state = OPEN
+                endpoint.open_until = monotonic() + self.cooldown
+
+    async def run_health_checks(self, interval: float, path: str = "/health"):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_health(path)
+            except Exception:
+                logger.exception("LLM endpoint health check failed")
+
+    def stats(self) -> list[dict]:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+    def models(self, default: str | None = None) -> list[str]:
+        """Distinct model names the pool's endpoints send, with `default` for endpoints without an override."""
+        return sorted({endpoint.model or default or "" for endpoint in self.endpoints})
+
+    def queue_depth(self) -> dict:
+        """Calls waiting for a concurrency slot, by priority, summed over the pool's clients."""
+        depth = {"interactive": 0, "batch": 0}
+        clients = {}
+        for endpoint in self.endpoints:
+            # An endpoint's own client only exists once it has been used; don't create it here
+            if endpoint.url and endpoint._client is None:
+                continue
+            clients[id(endpoint.client)] = endpoint.client
+        for client in clients.values():
+            for level, count in client.queue_depth().items():
+                depth[level] += count
+        return depth
+
+
+def parse_endpoints(value: str | None) -> list[Endpoint]:
+    """
+    Endpoints from LLM_ENDPOINTS: a JSON list of {"url", "model", "weight", "api_key"}
+    objects (only "url" is required). Empty means the single OWUI_BASE_URL server.
+    """
+    if not value:
+        return [Endpoint()]
+    return [
+        Endpoint(
+            url=item["url"],
+            model=item.get("model"),
+            weight=float(item.get("weight", 1)),
+            api_key=item.get("api_key"),
+        )
+        for item in json.loads(value)
+    ]
+
+
+def pool_from_env() -> EndpointPool:
+    pool = EndpointPool(
+        parse_endpoints(os.getenv("LLM_ENDPOINTS")),
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES") or "3"),
+        cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN") or "30"),
+    )
+    models = pool.models(os.getenv("MODEL_NAME"))
+    if len(models) > 1:
+        logger.warning("LLM endpoints send different model names (%s); they must all serve the same model, "
+                       "as answers are cached and reused across them", ", ".join(models))
+    return pool
+
+
+_pool: EndpointPool | None = None
+
+
+def model_id() -> str:
+    """
+    The model answers come from, for cache keys and stored verdicts: every model
+    name the pool sends, so changing any endpoint's model invalidates them.
+    """
+    return "+".join(get_pool().models(os.getenv("MODEL_NAME")))
+
+
+def get_pool() -> EndpointPool:
+    global _pool
+    if _pool is None:
+        _pool = pool_from_env()
+    return _pool
+
+
+def set_pool(pool: EndpointPool | None):
+    global _pool
+    _pool = pool
+
+
+async def close_pool():
+    """Close the connection pools of configured endpoints (the shared client is closed by llm_client)."""
+    global _pool
+    if _pool is not None:
+        for endpoint in _pool.endpoints:
+            if endpoint.url and endpoint._client is not None:
+                await endpoint._client.aclose()
+        _pool = None
@@ -0,0 +1,228 @@
+# backend/core/extract.py
+import asyncio
+import codecs
+import csv
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from core.cache import make_key
+from db import models
+
+# Bump when extraction output changes so cached text from the old extractors is not reused
+EXTRACTOR_VERSION = "extract-v2"
+SUPPORTED_TYPES = ("txt", "pdf", "docx", "csv")
+
+_READ_SIZE = 1024 * 1024
+_CSV_BATCH_ROWS = 1000
+
+
+def file_type_of(filename: str) -> str:
+    """Lowercased extension of `filename`; raises ValueError for unsupported types."""
+    file_type = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if file_type not in SUPPORTED_TYPES:
+        raise ValueError(f"Unsupported file type '{file_type}' (expected one of {', '.join(SUPPORTED_TYPES)})")
+    return file_type
+
+
+async def save_upload(upload, suffix: str = "") -> tuple[str, str]:
+    """
+    Spool an uploaded file to a temporary path while hashing it.
+
+    Returns:
+        tuple[str, str]: (path, sha256 hex digest). The caller deletes the file.
+    """
+    digest = hashlib.sha256()
+    handle = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with handle:
+            while chunk := await upload.read(_READ_SIZE):
+                digest.update(chunk)
+                handle.write(chunk)
+    except BaseException:
+        os.unlink(handle.name)
+        raise
+    return handle.name, digest.hexdigest()
+
+
+# --- Worker-process functions (module level so they can be pickled) ---
+
+def _pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _pdf_pages(path: str, start: int, stop: int) -> str:
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return "\n".join(reader.pages[i].extract_text() or "" for i in range(start, stop))
+
+
+def _docx_text(path: str) -> str:
+    import docx
+    # Blank lines between paragraphs: DOCX paragraphs are real boundaries, not wrapped lines
+    return "\n\n".join(paragraph.text for paragraph in docx.Document(path).paragraphs)
+
+
+# --- In-process streaming readers ---
+
+def _read_text_blocks(path: str):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as f:
+        while block := f.read(_READ_SIZE):
+            yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+def _read_csv_batches(path: str):
+    """One "column: value; ..." line per row, blank-line separated so each row is its own paragraph."""
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        batch = []
+        for row in reader:
+            cells = [
+                f"{header[i]}: {value}" if i < len(header) and header[i] else value
+                for i, value in enumerate(row) if value.strip()
+            ]
+            if cells:
+                batch.append("; ".join(cells).replace("\n", " "))
+            if len(batch) >= _CSV_BATCH_ROWS:
+                yield "\n\n".join(batch) + "\n\n"
+                batch = []
+        if batch:
+            yield "\n\n".join(batch) + "\n\n"
+
+
+async def _aiter_blocking(iterator):
+    """Drive a blocking generator from a worker thread, one item at a time."""
+    done = object()
+    while (item := await asyncio.to_thread(next, iterator, done)) is not done:
+        yield item
+
+
+class Extractor:
+    """
+    Text extraction for uploaded files.
+
+    PDFs are split into page ranges that are extracted in parallel across a
+    process pool and yielded in page order, with at most a few ranges per
+    worker in flight; DOCX is parsed in the pool; TXT and CSV are read
+    incrementally in a thread. Nothing runs on the event loop.
+    """
+
+    def __init__(self, workers: int | None = None, pages_per_task: int = 50):
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def aiter_text(self, path: str, file_type: str):
+        """Yield the text of the file at `path` in order, in blocks (a page range, a CSV batch, ...)."""
+        if file_type == "pdf":
+            async for block in self._aiter_pdf(path):
+                yield block
+        elif file_type == "docx":
+            yield await self._run(_docx_text, path)
+        elif file_type == "csv":
+            async for block in _aiter_blocking(_read_csv_batches(path)):
+                yield block
+        else:
+            async for block in _aiter_blocking(_read_text_blocks(path)):
+                yield block
+
+    async def _aiter_pdf(self, path: str):
+        page_count = await self._run(_pdf_page_count, path)
+        # Small files get one range per worker; large ones are capped at pages_per_task
+        step = max(1, min(self.pages_per_task, -(-page_count // self.workers)))
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+        in_flight = []
+        next_range = 0
+        while next_range < len(ranges) or in_flight:
+            while next_range < len(ranges) and len(in_flight) < self.workers * 2:
+                start, stop = ranges[next_range]
+                in_flight.append(asyncio.ensure_future(self._run(_pdf_pages, path, start, stop)))
+                next_range += 1
+            try:
+                text = await in_flight.pop(0)
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
+            # End each range on a line break so its last line is not glued onto the next range's first
+            yield text + "\n"
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def cache_key(file_type: str, file_hash: str) -> str:
+    return make_key(EXTRACTOR_VERSION, file_type, file_hash)
+
+
+def cached_text(db: Session, file_type: str, file_hash: str) -> str | None:
+    entry = db.get(models.ExtractedText, cache_key(file_type, file_hash))
+    return entry.text if entry else None
+
+
+def store_text(db: Session, file_type: str, file_hash: str, text: str):
+    """Remember the extracted text for a file hash. Does not commit."""
+    db.merge(models.ExtractedText(key=cache_key(file_type, file_hash), file_type=file_type, text=text))
+
+
+async def aiter_file_text(db: Session, path: str, file_type: str, file_hash: str, cache_info: dict | None = None):
+    """
+    Yield the text of an uploaded file, served from the extraction cache when
+    the same bytes were extracted before, otherwise extracted and then cached.
+    `cache_info["cached"]` is set to whether the cache was hit.
+    """
+    text = await asyncio.to_thread(cached_text, db, file_type, file_hash)
+    if cache_info is not None:
+        cache_info["cached"] = text is not None
+    if text is not None:
+        yield text
+        return
+
+    blocks = []
+    async for block in get_extractor().aiter_text(path, file_type):
+        blocks.append(block)
+        yield block
+    await asyncio.to_thread(store_text, db, file_type, file_hash, "".join(blocks))
+
+
+def extractor_from_env() -> Extractor:
+    return Extractor(
+        workers=int(os.getenv("EXTRACT_WORKERS") or "0") or None,
+        pages_per_task=int(os.getenv("EXTRACT_PAGES_PER_TASK") or "50"),
+    )
+
+
+_extractor: Extractor | None = None
+
+
+def get_extractor() -> Extractor:
+    global _extractor
+    if _extractor is None:
+        _extractor = extractor_from_env()
+    return _extractor
+
+
+def shutdown_extractor():
+    global _extractor
+    if _extractor is not None:
+        _extractor.shutdown()
+        _extractor = None
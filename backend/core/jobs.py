@@ -0,0 +1,166 @@
+# backend/core/jobs.py
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from db import models, session
+from core import pipeline
+
+logger = logging.getLogger(__name__)
+
+
+async def run_check_document(db: Session, payload: dict, on_progress) -> dict:
+    return await pipeline.check_document(
+        db, payload["document_id"], payload.get("rule_ids"),
+        payload.get("concurrency"), payload.get("pack_size"), on_progress,
+        payload.get("exhaustive"), payload.get("top_k"), payload.get("min_score"),
+    )
+
+
+async def run_recheck_document(db: Session, payload: dict, on_progress) -> dict:
+    return await pipeline.recheck_document(
+        db, payload["document_id"], payload.get("concurrency"), payload.get("pack_size"), on_progress,
+    )
+
+
+async def run_generate_rules(db: Session, payload: dict, on_progress) -> dict:
+    result = await pipeline.generate_rules(db, payload["text"], payload.get("chunk_tokens"))
+    on_progress(1, 1)
+    return result
+
+
+HANDLERS = {
+    "check_document": run_check_document,
+    "recheck_document": run_recheck_document,
+    "generate_rules": run_generate_rules,
+}
+
+
+def enqueue(db: Session, kind: str, payload: dict) -> models.Job:
+    job = models.Job(kind=kind, payload=payload, status="queued")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim(db: Session, worker_id: str) -> models.Job | None:
+    """
+    Atomically take the oldest runnable job. Jobs left `running` by a worker
+    that stopped heartbeating (see _heartbeat) are reclaimed. Concurrent workers skip rows
+    another worker has locked instead of blocking on them.
+    """
+    stale_cutoff = datetime.utcnow() - timedelta(seconds=int(os.getenv("JOB_STALE_SECONDS") or "300"))
+    job = db.query(models.Job).filter(or_(
+        models.Job.status == "queued",
+        (models.Job.status == "running") & (models.Job.heartbeat_at < stale_cutoff),
+    )).order_by(models.Job.id).with_for_update(skip_locked=True).first()
+    if job is None:
+        db.commit()
+        return None
+
+    now = datetime.utcnow()
+    job.status = "running"
+    job.worker_id = worker_id
+    job.attempts = (job.attempts or 0) + 1
+    job.started_at = job.started_at or now
+    job.heartbeat_at = now
+    db.commit()
+    return job
+
+
+def eta_seconds(job: models.Job) -> float | None:
+    """Linear estimate of remaining time from the progress made since the job started."""
+    if job.status != "running" or not job.started_at or not job.progress_done or not job.progress_total:
+        return None
+    elapsed = (datetime.utcnow() - job.started_at).total_seconds()
+    remaining = job.progress_total - job.progress_done
+    return round(elapsed / job.progress_done * remaining, 1)
+
+
+def _update_owned(job_id: int, worker_id: str, values: dict) -> bool:
+    """
+    Update a running job's row only while `worker_id` still owns it. Returns
+    False once another worker has reclaimed the job.
+    """
+    db = session.SessionLocal()
+    try:
+        updated = db.query(models.Job).filter(
+            models.Job.id == job_id, models.Job.worker_id == worker_id, models.Job.status == "running"
+        ).update(values, synchronize_session=False)
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+
+async def _heartbeat(job_id: int, worker_id: str, progress: dict, task: asyncio.Task, interval: float) -> bool:
+    """
+    Refresh heartbeat_at (and flush progress) every `interval` seconds while
+    `task` runs, however long its LLM calls wait on backoff or timeouts. If the
+    job has been reclaimed, the task is cancelled and False is returned.
+    """
+    while not task.done():
+        await asyncio.sleep(interval)
+        values = {"heartbeat_at": datetime.utcnow(), **progress}
+        if not await asyncio.to_thread(_update_owned, job_id, worker_id, values):
+            logger.warning("Job %s was reclaimed by another worker; abandoning it", job_id)
+            task.cancel()
+            return False
+    return True
+
+
+async def run(job_id: int, worker_id: str):
+    """Execute a claimed job, recording progress, result and final status on its row."""
+    db = session.SessionLocal()
+    try:
+        job = await asyncio.to_thread(db.get, models.Job, job_id)
+        kind, payload, attempts = job.kind, job.payload or {}, job.attempts
+    finally:
+        db.close()
+
+    handler = HANDLERS.get(kind)
+    max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS") or "3")
+    if handler is None or attempts > max_attempts:
+        await asyncio.to_thread(_update_owned, job_id, worker_id, {
+            "status": "failed",
+            "error": f"Unknown job kind '{kind}'" if handler is None else "Too many attempts",
+            "finished_at": datetime.utcnow(),
+        })
+        return
+
+    # Progress is kept in memory and written with each heartbeat
+    progress = {}
+
+    def on_progress(done: int, total: int):
+        progress["progress_done"] = done
+        progress["progress_total"] = total
+
+    work = session.SessionLocal()
+    try:
+        task = asyncio.create_task(handler(work, payload, on_progress))
+        heartbeat = asyncio.create_task(_heartbeat(
+            job_id, worker_id, progress, task, float(os.getenv("JOB_HEARTBEAT_INTERVAL") or "10")
+        ))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if not (heartbeat.done() and not heartbeat.cancelled() and heartbeat.result() is False):
+                raise
+            return
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            await asyncio.to_thread(work.rollback)
+            final = {"status": "failed", "error": str(e)}
+        else:
+            final = {"status": "succeeded", "result": result}
+        finally:
+            heartbeat.cancel()
+
+        final.update(progress, finished_at=datetime.utcnow())
+        if not await asyncio.to_thread(_update_owned, job_id, worker_id, final):
+            logger.warning("Job %s was reclaimed by another worker; discarding its %s status", job_id, final["status"])
+    finally:
+        work.close()
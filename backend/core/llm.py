@@ -1,31 +1,20 @@
 # backend/core/llm.py
 from fastapi import HTTPException
-import os, json, requests
+import os, json
+import asyncio
 import imaplib
 import base64
 import mimetypes
 import re
+import logging
+from time import perf_counter
+from core.endpoints import get_pool, model_id
+from core.scheduler import get_scheduler, is_retryable, parse_retry_after, UpstreamError
+from core import sse, metrics
+from core.cache import get_cache, make_key
+from core.prompts import get_template
 
-def clean_your_string(text_str):
-    results = []
-    # Split response into lines and process each 'data: ' line
-    for line in text_str.splitlines():
-        line = line.strip()
-        if line.startswith('data: ') and line != 'data: [DONE]':
-            try:
-                json_str = line.replace('data: ', '', 1)
-                parsed = json.loads(json_str)
-                content = parsed['choices'][0]['delta'].get('content')
-                if content:
-                    results.append(content)
-            except json.JSONDecodeError as e:
-                print(f"Failed to decode line: {line}\nError: {e}")
-    
-    # Join content parts and strip markdown formatting
-    full_content = ''.join(results)
-    content = re.sub(r'^```json\n|```$', '', full_content.strip(), flags=re.MULTILINE)
-
-    return content
+logger = logging.getLogger(__name__)
 
 def create_image_data(image_path: str):
     """
@@ -57,6 +46,9 @@ def create_text_only_payload(prompt, model):
         }
     return payload
 
+def create_messages_payload(messages, model):
+    return {"model": model, "messages": messages}
+
 def create_text_and_image_payload(prompt, image_path, model):
     image_data_dict = create_image_data(image_path)
     # Define the request body (JSON payload)
@@ -82,94 +74,391 @@ def create_text_and_image_payload(prompt, image_path, model):
         } 
     return payload
 
-def call_llm(payload, owui_user_api_key):
-    OWUI_BASE_URL = os.getenv("OWUI_BASE_URL")
+def estimate_prompt_tokens(payload) -> int:
+    """Rough token count of a chat request's message text."""
+    prompt_chars = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            prompt_chars += len(content)
+        else:
+            prompt_chars += sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+    return prompt_chars // 4
+
+
+def estimate_payload_tokens(payload) -> int:
+    """Rough token cost of a chat request (prompt text plus the expected completion) for rate budgeting."""
+    return estimate_prompt_tokens(payload) + int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE") or "256")
 
-    # Define the API endpoint and the JWT btoken
-    url = f"{OWUI_BASE_URL}/api/chat/completions"
 
-    # Define the request headers
+async def raise_for_upstream_status(resp):
+    if resp.status_code < 400:
+        return
+    detail = (await resp.aread()).decode("utf-8", errors="replace")[:500]
+    raise UpstreamError(resp.status_code, detail, parse_retry_after(resp.headers.get("retry-after")))
+
+
+def endpoint_request(endpoint, payload, owui_user_api_key):
+    """Headers and payload for `endpoint`, applying its model and API key overrides."""
     headers = {
-        "Authorization": f"Bearer {owui_user_api_key}",
+        "Authorization": f"Bearer {endpoint.api_key or owui_user_api_key}",
         "Content-Type": "application/json"
     }
+    if endpoint.model:
+        payload = {**payload, "model": endpoint.model}
+    return headers, payload
+
+
+async def post_completion(endpoint, payload, owui_user_api_key):
+    headers, payload = endpoint_request(endpoint, payload, owui_user_api_key)
+
+    # Send the POST request over the endpoint's connection pool; event streams are
+    # decoded as they arrive instead of being buffered and reparsed
+    async with endpoint.client.stream("/api/chat/completions", headers=headers, json=payload) as resp:
+        await raise_for_upstream_status(resp)
+        if resp.headers.get("content-type", "").startswith("text/event-stream"):
+            return sse.strip_fences("".join([content async for content in sse.aiter_content(resp.aiter_bytes())]))
+        body = await resp.aread()
 
-    # Send the POST request
-    resp = requests.post(url, headers=headers, json=payload)
     try:
-        content = resp.json()['choices'][0]['message']['content']
-    except:
-        content = clean_your_string(resp.text)
+        content = json.loads(body)['choices'][0]['message']['content']
+    except (json.JSONDecodeError, KeyError, IndexError, TypeError):
+        content = sse.collect([body])
 
     return content
 
 
-def general_llm_query(query):
+async def post_with_failover(payload, owui_user_api_key):
+    """Try the pool's best endpoint, moving on to the next one straight away if it fails."""
+    pool = get_pool()
+    tried = []
+    while True:
+        endpoint = pool.pick(exclude=tried)
+        try:
+            async with pool.track(endpoint, is_failure=is_retryable):
+                return await post_completion(endpoint, payload, owui_user_api_key)
+        except Exception as e:
+            tried.append(endpoint)
+            if not is_retryable(e) or pool.pick(exclude=tried) is None:
+                raise
+            logger.warning("LLM endpoint %s failed (%s); failing over", endpoint.name, e)
+
+
+async def call_llm(payload, owui_user_api_key, prompt_type="query"):
+    """
+    Runs one completion through the rate-limit scheduler on the least-loaded healthy endpoint.
+    Failed endpoints are skipped within an attempt; the scheduler retries with backoff once all have failed.
+    `prompt_type` (check, fix, rules, query) labels the call's latency and token metrics.
+    """
+    started = perf_counter()
+    try:
+        content = await get_scheduler().run(
+            lambda: post_with_failover(payload, owui_user_api_key), estimate_payload_tokens(payload)
+        )
+    except Exception:
+        metrics.observe_llm(prompt_type, started, "error", estimate_prompt_tokens(payload), None)
+        raise
+    metrics.observe_llm(prompt_type, started, "ok", estimate_prompt_tokens(payload), content)
+    return content
+
+
+async def stream_llm(payload, owui_user_api_key, prompt_type="query"):
+    """
+    Streams a completion, yielding content deltas as the upstream SSE events arrive.
+    Falls back to yielding the whole message if the server answers with plain JSON.
+    Failures are retried only until the first delta has been yielded, each time on the best
+    endpoint that hasn't failed yet (all of them again once every endpoint has failed).
+    """
+    started = perf_counter()
+    deltas = []
+    outcome = "error"
+    try:
+        async for content in _stream_with_retries(payload, owui_user_api_key):
+            deltas.append(content)
+            yield content
+        outcome = "ok"
+    except GeneratorExit:
+        outcome = "cancelled"
+        raise
+    finally:
+        metrics.observe_llm(prompt_type, started, outcome, estimate_prompt_tokens(payload), "".join(deltas))
+
+
+async def _stream_with_retries(payload, owui_user_api_key):
+    payload = {**payload, "stream": True}
+    scheduler = get_scheduler()
+    pool = get_pool()
+    tokens = estimate_payload_tokens(payload)
+
+    attempt = 0
+    tried = []
+    while True:
+        await scheduler.acquire(tokens)
+        endpoint = pool.pick(exclude=tried)
+        if endpoint is None:
+            tried = []
+            endpoint = pool.pick()
+        headers, request = endpoint_request(endpoint, payload, owui_user_api_key)
+        started = False
+        try:
+            async with pool.track(endpoint, is_failure=is_retryable):
+                async with endpoint.client.stream("/api/chat/completions", headers=headers, json=request) as resp:
+                    await raise_for_upstream_status(resp)
+                    if resp.headers.get("content-type", "").startswith("application/json"):
+                        body = json.loads(await resp.aread())
+                        started = True
+                        yield body['choices'][0]['message']['content']
+                        return
+
+                    async for content in sse.aiter_content(resp.aiter_bytes()):
+                        started = True
+                        yield content
+                    return
+        except Exception as e:
+            delay = None if started or not is_retryable(e) else scheduler.retry_delay(attempt, e)
+            if delay is None:
+                raise
+            tried.append(endpoint)
+            logger.warning("LLM stream from %s failed (%s); retry %d in %.1fs", endpoint.name, e, attempt + 1, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def general_llm_query(query):
 
     MODEL_NAME = os.getenv("MODEL_NAME")
     OWUI_API_KEY = os.getenv("OWUI_API_KEY")
     payload = create_text_only_payload(query, MODEL_NAME)
 
     try:
-        result = call_llm(payload, OWUI_API_KEY)
+        result = await call_llm(payload, OWUI_API_KEY)
         return {"response": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM query failed: {str(e)}")
 
 
 
-def check_violation(paragraph: str, rule: str) -> str:
+async def check_violation(paragraph: str, rule: str) -> str:
     MODEL_NAME = os.getenv("MODEL_NAME") 
     OWUI_API_KEY = os.getenv("OWUI_API_KEY")
 
-    prompt = f"Does the following paragraph violate the rule '{rule}'? If so, identify the problematic text:\n\n{paragraph}"
+    template = get_template("check")
+    cache_key = make_key(model_id(), template.cache_id(), paragraph, rule)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return cached
+
+    payload = create_messages_payload(template.messages(rule=rule, paragraph=paragraph), MODEL_NAME)
+
+    try:
+        result = await call_llm(payload, OWUI_API_KEY, "check")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM query failed: {str(e)}")
+
+    await get_cache().set(cache_key, "check", result)
+    return result  # ✅ return raw string, not {"response": result}
+
+
+
+async def check_violations_packed(paragraph: str, rules: list[str]) -> list[str]:
+    """
+    Checks one paragraph against several rules with a single prompt.
+    Verdicts are cached per rule, so only rules without a cached verdict are
+    sent to the model.
+
+    Args:
+        paragraph (str): Paragraph text.
+        rules (list[str]): Rule descriptions, evaluated in order.
+
+    Returns:
+        list[str]: One verdict per rule, aligned with `rules`.
+
+    Raises:
+        ValueError: If the model's answer is not a verdict for every rule.
+    """
+    MODEL_NAME = os.getenv("MODEL_NAME")
+    OWUI_API_KEY = os.getenv("OWUI_API_KEY")
+
+    template = get_template("check-packed")
+    cache = get_cache()
+    cache_keys = [make_key(model_id(), template.cache_id(), paragraph, rule) for rule in rules]
+    results = [await cache.get(key) for key in cache_keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
 
-    payload = create_text_only_payload(prompt, MODEL_NAME)
+    numbered_rules = "\n".join(f"{n}. {rules[i]}" for n, i in enumerate(pending, start=1))
+    payload = create_messages_payload(template.messages(rules=numbered_rules, paragraph=paragraph), MODEL_NAME)
 
     try:
-        result = call_llm(payload, OWUI_API_KEY)
-        return result  # ✅ return raw string, not {"response": result}
+        raw_output = await call_llm(payload, OWUI_API_KEY, "check")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM query failed: {str(e)}")
 
+    for i, verdict in zip(pending, parse_packed_verdicts(raw_output, len(pending))):
+        results[i] = verdict
+        await cache.set(cache_keys[i], "check", verdict)
+    return results
 
 
-def suggest_fix(text: str, rule: str) -> str:
+def parse_packed_verdicts(raw_output: str, rule_count: int) -> list[str]:
+    content = re.sub(r'^```(?:json)?\s*|```\s*$', '', raw_output.strip())
+    try:
+        verdicts = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Packed verdict is not valid JSON: {e}")
+    if not isinstance(verdicts, list):
+        raise ValueError("Packed verdict is not a JSON array")
+
+    by_rule = {}
+    for verdict in verdicts:
+        if isinstance(verdict, dict) and isinstance(verdict.get("rule"), int):
+            by_rule[verdict["rule"]] = verdict
+    missing = [i for i in range(1, rule_count + 1) if i not in by_rule]
+    if missing:
+        raise ValueError(f"Packed verdict is missing rules {missing}")
+
+    results = []
+    for i in range(1, rule_count + 1):
+        verdict = by_rule[i]
+        if verdict.get("violated"):
+            results.append(verdict.get("problematic_text") or "Violation found.")
+        else:
+            results.append("No violation found.")
+    return results
+
+
+async def suggest_fix(text: str, rule: str) -> str:
     MODEL_NAME = os.getenv("MODEL_NAME") 
     OWUI_API_KEY = os.getenv("OWUI_API_KEY")
 
-    prompt = f"""Given the following issues identified in a paragraph:\n\n{rule}
-                 Here is the original paragraph:{text}
-                 Rewrite the paragraph to address all the issues above. Return only the improved version of the paragraph. 
-             """
+    template = get_template("fix")
+    cache_key = make_key(model_id(), template.cache_id(), text, rule)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return cached
+
+    payload = create_messages_payload(template.messages(issues=rule, paragraph=text), MODEL_NAME)
+
+    try:
+        result = await call_llm(payload, OWUI_API_KEY, "fix")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM query failed: {str(e)}")
+
+    await get_cache().set(cache_key, "fix", result)
+    return result
+
+
+async def stream_suggest_fix(text: str, rule: str):
+    """Streaming variant of suggest_fix; the assembled fix is cached once the stream completes."""
+    MODEL_NAME = os.getenv("MODEL_NAME")
+    OWUI_API_KEY = os.getenv("OWUI_API_KEY")
+
+    template = get_template("fix")
+    cache_key = make_key(model_id(), template.cache_id(), text, rule)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    payload = create_messages_payload(template.messages(issues=rule, paragraph=text), MODEL_NAME)
+
+    parts = []
+    async for delta in stream_llm(payload, OWUI_API_KEY, "fix"):
+        parts.append(delta)
+        yield delta
+    await get_cache().set(cache_key, "fix", "".join(parts))
+
+
+async def suggest_span_fixes(paragraph: str, regions: list[dict]) -> list[str]:
+    """
+    Asks for replacements of just the offending regions of a paragraph
+    instead of a rewrite of the whole paragraph, so output tokens scale with
+    the size of the problem rather than the paragraph.
+
+    Args:
+        paragraph (str): Paragraph text.
+        regions (list[dict]): Regions to rewrite (see spans.fix_regions).
+
+    Returns:
+        list[str]: One replacement per region, aligned with `regions`.
 
+    Raises:
+        ValueError: If the model's answer is not a replacement for every region.
+    """
+    MODEL_NAME = os.getenv("MODEL_NAME")
+    OWUI_API_KEY = os.getenv("OWUI_API_KEY")
 
-    payload = create_text_only_payload(prompt, MODEL_NAME)
+    template = get_template("fix-spans")
+    targets = json.dumps([[region["start"], region["end"], region["rules"]] for region in regions])
+    cache_key = make_key(model_id(), template.cache_id(), paragraph, targets)
+    cached = await get_cache().get(cache_key)
+    if cached is not None:
+        return json.loads(cached)
+
+    numbered_passages = "\n".join(
+        f'{n}. "{region["text"]}"\n   Breaks: ' + "; ".join(region["rules"])
+        for n, region in enumerate(regions, start=1)
+    )
+    payload = create_messages_payload(template.messages(passages=numbered_passages, paragraph=paragraph), MODEL_NAME)
 
     try:
-        result = call_llm(payload, OWUI_API_KEY)
-        return result
+        raw_output = await call_llm(payload, OWUI_API_KEY, "fix")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM query failed: {str(e)}")
 
+    replacements = parse_span_replacements(raw_output, len(regions))
+    await get_cache().set(cache_key, "fix", json.dumps(replacements))
+    return replacements
 
-def generate_compliance_rules(text: str) -> list[str]:
-    MODEL_NAME = os.getenv("MODEL_NAME") 
+
+def parse_span_replacements(raw_output: str, region_count: int) -> list[str]:
+    content = re.sub(r'^```(?:json)?\s*|```\s*$', '', raw_output.strip())
+    try:
+        replacements = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Span fix is not valid JSON: {e}")
+    if not isinstance(replacements, list):
+        raise ValueError("Span fix is not a JSON array")
+
+    by_passage = {}
+    for replacement in replacements:
+        if (isinstance(replacement, dict) and isinstance(replacement.get("passage"), int)
+                and isinstance(replacement.get("replacement"), str)):
+            by_passage[replacement["passage"]] = replacement["replacement"]
+    missing = [i for i in range(1, region_count + 1) if i not in by_passage]
+    if missing:
+        raise ValueError(f"Span fix is missing passages {missing}")
+    return [by_passage[i] for i in range(1, region_count + 1)]
+
+
+async def stream_general_llm_query(query):
+    MODEL_NAME = os.getenv("MODEL_NAME")
     OWUI_API_KEY = os.getenv("OWUI_API_KEY")
-    
-    prompt = f"""You are a compliance officer. Given the following policy document or guideline, extract a concise list of explicit compliance rules.
-    Each rule should be clear, actionable, and self-contained. Only return the rules, no other text. Return the rules as a list (one per line). 
+    payload = create_text_only_payload(query, MODEL_NAME)
+
+    async for delta in stream_llm(payload, OWUI_API_KEY):
+        yield delta
 
-    Document:
-    {text}
 
-    Compliance Rules:"""
+async def generate_compliance_rules(text: str) -> list[str]:
+    MODEL_NAME = os.getenv("MODEL_NAME") 
+    OWUI_API_KEY = os.getenv("OWUI_API_KEY")
+
+    template = get_template("rules")
+    cache_key = make_key(model_id(), template.cache_id(), text)
+    raw_output = await get_cache().get(cache_key)
+    if raw_output is not None:
+        return [line.strip() for line in raw_output.split('\n') if line.strip()]
 
-    payload = create_text_only_payload(prompt, MODEL_NAME)
+    payload = create_messages_payload(template.messages(document=text), MODEL_NAME)
 
     try:
-        raw_output = call_llm(payload, OWUI_API_KEY)
+        raw_output = await call_llm(payload, OWUI_API_KEY, "rules")
         result = [line.strip() for line in raw_output.split('\n') if line.strip()]
-        return result  
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM query failed: {str(e)}")
+
+    await get_cache().set(cache_key, "rules", raw_output)
+    return result
+
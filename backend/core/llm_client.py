@@ -0,0 +1,91 @@
+# backend/core/llm_client.py
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+
+from core.scheduler import PrioritySlots
+
+
+class LLMClient:
+    """
+    Shared async HTTP client for the Open WebUI chat completions API.
+
+    Keeps a pool of keep-alive (or HTTP/2) connections to the base URL and
+    caps the number of requests in flight, so callers can fan out freely
+    without opening a socket per call. Freed slots go to interactive calls
+    before batch ones, and `interactive_slots` of them are kept for
+    interactive calls only.
+    """
+
+    def __init__(self, base_url: str, connect_timeout: float = 5.0, read_timeout: float = 120.0,
+                 max_connections: int = 100, max_keepalive: int = 20, max_concurrency: int = 64,
+                 interactive_slots: int = 0, http2: bool = False,
+                 transport: httpx.AsyncBaseTransport | None = None):
+        self.base_url = base_url
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_keepalive),
+            http2=http2,
+            transport=transport,
+        )
+        self._slots = PrioritySlots(max_concurrency, interactive_slots)
+
+    def queue_depth(self) -> dict:
+        """Calls waiting for a concurrency slot, by priority."""
+        return self._slots.queue_depth()
+
+    async def post(self, path: str, json: dict, headers: dict) -> httpx.Response:
+        async with self._slots:
+            return await self._client.post(path, json=json, headers=headers)
+
+    async def get(self, path: str) -> httpx.Response:
+        return await self._client.get(path)
+
+    @asynccontextmanager
+    async def stream(self, path: str, json: dict, headers: dict):
+        """POST and yield the response before its body is read, for incremental consumption."""
+        async with self._slots:
+            async with self._client.stream("POST", path, json=json, headers=headers) as response:
+                yield response
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def client_from_env(base_url: str | None = None) -> LLMClient:
+    return LLMClient(
+        base_url=base_url or os.getenv("OWUI_BASE_URL") or "",
+        connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT") or "5"),
+        read_timeout=float(os.getenv("LLM_READ_TIMEOUT") or "120"),
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS") or "100"),
+        max_keepalive=int(os.getenv("LLM_MAX_KEEPALIVE") or "20"),
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY") or "64"),
+        interactive_slots=int(os.getenv("LLM_INTERACTIVE_SLOTS") or "8"),
+        http2=(os.getenv("LLM_HTTP2") or "false").lower() == "true",
+    )
+
+
+_client: LLMClient | None = None
+
+
+def get_client() -> LLMClient:
+    global _client
+    if _client is None:
+        _client = client_from_env()
+    return _client
+
+
+def set_client(client: LLMClient | None):
+    """Swap the shared client (e.g. for a mock transport in tests or benchmarks)."""
+    global _client
+    _client = client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,115 @@
+# backend/core/metrics.py
+from contextlib import contextmanager
+from time import perf_counter
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event, func, select
+
+_LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+_DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to response headers per route",
+    ["method", "route", "status"],
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "LLM call latency including queueing and retries",
+    ["prompt_type", "outcome"], buckets=_LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens", "Estimated LLM tokens (characters / 4) per prompt type",
+    ["prompt_type", "direction"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ["operation"], buckets=_DB_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_duration_seconds", "Time spent per stage of a request or job",
+    ["pipeline", "stage"], buckets=_LLM_BUCKETS,
+)
+
+
+@contextmanager
+def stage(pipeline: str, name: str):
+    """Time a block as `name` (parse, db, llm, persist) of `pipeline`."""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(pipeline, name).observe(perf_counter() - started)
+
+
+def observe_llm(prompt_type: str, started: float, outcome: str, prompt_tokens: int, completion: str | None):
+    LLM_REQUEST_SECONDS.labels(prompt_type, outcome).observe(perf_counter() - started)
+    LLM_TOKENS.labels(prompt_type, "prompt").inc(prompt_tokens)
+    if completion:
+        LLM_TOKENS.labels(prompt_type, "completion").inc(len(completion) // 4 + 1)
+
+
+def instrument_engine(engine):
+    """Record every statement the engine executes, labelled by its leading SQL keyword."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(operation).observe(perf_counter() - started)
+
+
+class StateCollector:
+    """Reads cache counters, scheduler queue depth and the job backlog at scrape time."""
+
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory
+
+    def describe(self):
+        # Skip the registration-time collect(), which would query the database on import
+        return []
+
+    def collect(self):
+        from core.cache import get_cache
+        from core.scheduler import get_scheduler
+        from core.endpoints import get_pool
+
+        stats = get_cache().stats()
+        lookups = CounterMetricFamily("llm_cache_lookups", "LLM cache lookups by result", labels=["result"])
+        lookups.add_metric(["memory_hit"], stats["memory_hits"])
+        lookups.add_metric(["db_hit"], stats["db_hits"])
+        lookups.add_metric(["miss"], stats["misses"])
+        yield lookups
+        yield GaugeMetricFamily("llm_cache_hit_ratio", "Share of LLM cache lookups served from cache",
+                                value=stats["hit_ratio"])
+
+        waiting = GaugeMetricFamily("llm_scheduler_waiting", "LLM calls waiting for rate budget",
+                                    labels=["priority"])
+        for level, count in get_scheduler().queue_depth().items():
+            waiting.add_metric([level], count)
+        yield waiting
+
+        slot_waiting = GaugeMetricFamily("llm_slot_waiting", "LLM calls waiting for a concurrency slot",
+                                         labels=["priority"])
+        for level, count in get_pool().queue_depth().items():
+            slot_waiting.add_metric([level], count)
+        yield slot_waiting
+
+        if self.session_factory is not None:
+            from db.models import Job
+
+            db = self.session_factory()
+            try:
+                rows = db.execute(select(Job.status, func.count()).group_by(Job.status)).all()
+            finally:
+                db.close()
+            jobs = GaugeMetricFamily("jobs", "Background jobs by status", labels=["status"])
+            for status, count in rows:
+                jobs.add_metric([status], count)
+            yield jobs
+
+
+def register_state_collector(session_factory=None):
+    REGISTRY.register(StateCollector(session_factory))
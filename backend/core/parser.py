@@ -1,3 +1,296 @@
 # backend/core/parser.py
+import codecs
+import hashlib
+import os
+import re
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+
 def break_into_paragraphs(text: str) -> list[str]:
-    return [p.strip() for p in text.split('\n') if p.strip()]
+    """Split text into clause-sized segments (see Segmenter)."""
+    return list(iter_paragraphs([text]))
+
+
+def content_hash(text: str) -> str:
+    """Hash of the paragraph text with case and whitespace differences normalized away."""
+    normalized = " ".join(text.casefold().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def chunk_by_token_budget(paragraphs: list[str], max_tokens: int) -> list[str]:
+    """
+    Greedily pack consecutive paragraphs into chunks of at most `max_tokens`
+    estimated tokens. A paragraph larger than the budget is split on word
+    boundaries into chunks of its own.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in paragraphs:
+        tokens = estimate_tokens(paragraph)
+        if tokens > max_tokens:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            piece, piece_chars = [], 0
+            for word in paragraph.split():
+                piece.append(word)
+                piece_chars += len(word) + 1
+                if piece_chars // 4 >= max_tokens:
+                    chunks.append(" ".join(piece))
+                    piece, piece_chars = [], 0
+            if piece:
+                chunks.append(" ".join(piece))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+_BULLET = re.compile(r"^(?:[-*\u2022\u25e6\u25aa\u00b7\u2013]\s+|\(?(?:[a-z]|[ivx]{1,4}|\d{1,3})\)\s+)")
+# A clause number needs a terminator ("3." / "3)") or several levels ("3.2"), so a
+# wrapped line that merely starts with a number ("30 days of...") is not a clause
+_NUMBERED = re.compile(r"^\d{1,3}(?:(?:\.\d{1,3})+\.?|[.)])\s+\S")
+# Numbered headings may also be "3 Definitions"; only checked where a block can start
+_NUMBERED_HEADING = re.compile(r"^\d{1,3}(?:\.\d{1,3})*[.)]?\s+\S")
+_HEADING_PREFIX = re.compile(
+    r"^(?:#{1,6}\s+|(?:section|article|chapter|part|appendix|schedule|annex)\s+[0-9IVXLC]+[A-Z]?\b)",
+    re.IGNORECASE,
+)
+_PAGE_NUMBER = re.compile(r"^(?:page\s+)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?$", re.IGNORECASE)
+_CLOSERS = "\"')]\u201d\u2019"
+_TERMINAL = ".!?:;"
+_MINOR_WORDS = frozenset(("a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"))
+
+DEFAULT_MIN_TOKENS = 5
+DEFAULT_MAX_TOKENS = 400
+
+
+def _ends_sentence(line: str) -> bool:
+    stripped = line.rstrip(_CLOSERS)
+    return bool(stripped) and stripped[-1] in _TERMINAL
+
+
+def _is_heading(line: str, after_break: bool, ends_sentence: bool) -> bool:
+    """
+    Markdown/"Section 4"-style headings anywhere; ALL CAPS, "3.2 Title Case" and
+    bare Title Case lines only where a new block can start (`after_break`),
+    so wrapped body text is not mistaken for a heading.
+    """
+    if ends_sentence or len(line) > 120:
+        return False
+    if _HEADING_PREFIX.match(line):
+        return len(line.split()) <= 12
+    words = line.split(None, 10)
+    if len(words) > 10:
+        return False
+    if line.isupper() and sum(c.isalpha() for c in line) >= 3:
+        return True
+    if not after_break:
+        return False
+    if _NUMBERED_HEADING.match(line):
+        words = words[1:]
+    elif len(words) > 6:
+        return False
+    return bool(words) and words[0][0].isalpha() and all(
+        word[0].isupper() or not word[0].isalpha() or word.lower() in _MINOR_WORDS for word in words
+    )
+
+
+class _Segment:
+    __slots__ = ("parts", "chars", "leading", "in_list", "open_line", "after_heading")
+
+    def __init__(self):
+        self.parts = []
+        self.chars = 0
+        self.leading = False        # heading-only so far: must join the following text
+        self.in_list = False        # collecting a lead-in and its items
+        self.open_line = False      # last line lacks terminal punctuation
+        self.after_heading = False  # last line was a heading
+
+    @property
+    def tokens(self) -> int:
+        return self.chars // 4 + 1
+
+    def add(self, text: str, separator: str):
+        if self.parts and separator:
+            self.parts.append(separator)
+            self.chars += len(separator)
+        self.parts.append(text)
+        self.chars += len(text)
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class Segmenter:
+    """
+    Single-pass streaming segmentation of extracted text into clause-sized paragraphs.
+
+    Lines are scanned once, holding only the segment being built and the one
+    before it. A hard-wrapped line is joined to the previous one when that
+    line lacks terminal punctuation (or the new line starts in lowercase;
+    after a list item only a lowercase line continues it),
+    undoing end-of-line hyphenation. Blank lines and headings start a new
+    segment, and a heading stays attached to the text under it. A lead-in
+    ending in ":" keeps its list items, and consecutive bullets stay in one
+    segment, while each numbered clause starts its own. Segments are split
+    at `max_tokens`, and segments under `min_tokens` (page numbers, stray
+    fragments) are merged into a neighbour. Bare page-number lines are dropped.
+    """
+
+    def __init__(self, min_tokens: int = DEFAULT_MIN_TOKENS, max_tokens: int = DEFAULT_MAX_TOKENS):
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self._pending = ""
+        self._current = _Segment()
+        self._held: _Segment | None = None
+
+    def feed(self, chunk: str) -> list[str]:
+        """Consume a chunk of text and return the segments it completed."""
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        out = []
+        for line in lines:
+            self._line(line, out)
+        return out
+
+    def finish(self) -> list[str]:
+        """Flush the trailing partial line and every held segment."""
+        out = []
+        if self._pending:
+            self._line(self._pending, out)
+            self._pending = ""
+        self._close(out)
+        if self._held is not None:
+            out.append(self._held.text())
+            self._held = None
+        return out
+
+    def _line(self, raw: str, out: list):
+        line = " ".join(raw.split())
+        current = self._current
+        if not line:
+            self._close(out)
+            return
+        if _PAGE_NUMBER.match(line):
+            # Page headers/footers from PDF extraction ("12", "Page 3 of 40")
+            return
+
+        ends_sentence = _ends_sentence(line)
+        starts_block = not current.parts or not current.open_line
+        if _is_heading(line, starts_block, ends_sentence):
+            if not current.leading:
+                self._close(out)
+                current = self._current
+            current.add(line, "\n")
+            current.leading = True
+            current.after_heading = True
+            current.open_line = False
+            return
+
+        is_bullet = bool(_BULLET.match(line))
+        # A numbered clause only starts once the previous line closed a sentence or lead-in
+        is_item = is_bullet or (starts_block and bool(_NUMBERED.match(line)))
+        if is_item:
+            lead_in = current.parts and current.parts[-1].endswith(":")
+            if current.parts and not current.leading and not (lead_in or (current.in_list and is_bullet)):
+                self._close(out)
+                current = self._current
+            separator = "\n"
+            current.in_list = current.in_list or bool(lead_in) or is_bullet
+        elif current.after_heading or not current.parts:
+            separator = "\n"
+        elif line[0].islower() or (current.open_line and not (current.in_list and line[0].isupper())):
+            separator = " "
+            if current.parts[-1].endswith("-") and line[0].islower() and current.parts[-1][-2:-1].isalpha():
+                # Undo end-of-line hyphenation ("encryp-" + "tion")
+                current.parts[-1] = current.parts[-1][:-1]
+                current.chars -= 1
+                separator = ""
+        else:
+            self._close(out)
+            current = self._current
+            separator = ""
+
+        if current.parts and current.tokens + len(line) // 4 > self.max_tokens:
+            self._close(out)
+            current = self._current
+        while len(line) // 4 + 1 > self.max_tokens:
+            cut = line.rfind(" ", 0, self.max_tokens * 4) if " " in line[:self.max_tokens * 4] else self.max_tokens * 4
+            current.add(line[:cut], "")
+            self._close(out)
+            current = self._current
+            line = line[cut:].lstrip()
+
+        current.add(line, separator if current.parts else "")
+        current.leading = False
+        current.after_heading = False
+        current.open_line = not ends_sentence
+
+    def _close(self, out: list):
+        """Finish the current segment, merging undersized segments into a neighbour."""
+        segment, self._current = self._current, _Segment()
+        if not segment.parts:
+            return
+        held = self._held
+        if held is None:
+            self._held = segment
+            return
+        fits = held.tokens + segment.tokens <= self.max_tokens
+        if fits and (held.leading or held.tokens < self.min_tokens
+                     or (segment.tokens < self.min_tokens and not segment.leading)):
+            held.add(segment.text(), "\n")
+            held.leading = segment.leading
+            return
+        out.append(held.text())
+        self._held = segment
+
+
+def segmenter_from_env() -> Segmenter:
+    return Segmenter(
+        min_tokens=int(os.getenv("SEGMENT_MIN_TOKENS") or str(DEFAULT_MIN_TOKENS)),
+        max_tokens=int(os.getenv("SEGMENT_MAX_TOKENS") or str(DEFAULT_MAX_TOKENS)),
+    )
+
+
+def iter_paragraphs(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Streaming equivalent of break_into_paragraphs: yields segments from text
+    arriving in arbitrary chunks, holding at most two segments in memory.
+    """
+    segmenter = segmenter_from_env()
+    for chunk in chunks:
+        yield from segmenter.feed(chunk)
+    yield from segmenter.finish()
+
+
+async def aiter_paragraphs(byte_chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Yield paragraphs from a UTF-8 byte stream, e.g. a request body as it arrives."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    segmenter = segmenter_from_env()
+    async for chunk in byte_chunks:
+        for paragraph in segmenter.feed(decoder.decode(chunk)):
+            yield paragraph
+    for paragraph in segmenter.feed(decoder.decode(b"", final=True)) + segmenter.finish():
+        yield paragraph
+
+
+async def aiter_text_paragraphs(chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+    """Async variant of iter_paragraphs, e.g. over text blocks from core.extract."""
+    segmenter = segmenter_from_env()
+    async for chunk in chunks:
+        for paragraph in segmenter.feed(chunk):
+            yield paragraph
+    for paragraph in segmenter.finish():
+        yield paragraph
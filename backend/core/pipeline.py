@@ -0,0 +1,424 @@
+# backend/core/pipeline.py
+import asyncio
+import os
+import time
+from sqlalchemy import insert, update, bindparam, or_
+from sqlalchemy.orm import Session, joinedload
+from db import models, bulk
+from core import workflow, dedup, parser, scheduler, metrics, spans, prompts
+
+
+def prior_results(db: Session, document_id: int, hashes: list[str], rule_ids: list[int]) -> dict:
+    """
+    Latest non-stale result per (content hash, rule) recorded for paragraphs
+    of other documents with the current check prompts.
+
+    Returns:
+        dict[tuple[str, int], str]: highlighted text keyed by (content hash, rule id).
+    """
+    found = {}
+    if not rule_ids:
+        return found
+    for i in range(0, len(hashes), 1000):
+        rows = db.query(
+            models.Paragraph.content_hash, models.Violation.rule_id, models.Violation.highlighted_text
+        ).join(models.Violation.paragraph).filter(
+            models.Paragraph.content_hash.in_(hashes[i:i + 1000]),
+            models.Paragraph.document_id != document_id,
+            models.Violation.rule_id.in_(rule_ids),
+            models.Violation.stale.is_(False),
+            models.Violation.template_version == prompts.check_version(),
+        ).order_by(models.Violation.id)
+        for content_hash, rule_id, text in rows:
+            found[(content_hash, rule_id)] = text
+    return found
+
+
+def load_violations(db: Session, violation_ids: list[int]) -> list:
+    """Violations by id with their paragraph loaded, so they can be read without further queries."""
+    return db.query(models.Violation).options(joinedload(models.Violation.paragraph)).filter(
+        models.Violation.id.in_(violation_ids)
+    ).all()
+
+
+def rule_descriptions(db: Session, violations: list) -> dict[int, str]:
+    rule_ids = {v.rule_id for v in violations}
+    return dict(db.query(models.ComplianceRule.id, models.ComplianceRule.description).filter(
+        models.ComplianceRule.id.in_(rule_ids)
+    ))
+
+
+def fix_context(db: Session, violations: list) -> str:
+    """
+    The issues to fix in a paragraph, for the fix prompt: each violated rule with
+    only the offending spans. The model's full answer is used only when it could
+    not be aligned to the paragraph. "No violation" verdicts are left out.
+    """
+    rules = rule_descriptions(db, violations)
+    issues = []
+    for v in violations:
+        if spans.is_negative(v.highlighted_text):
+            continue
+        # Offsets of a stale violation point into the paragraph's old text
+        texts = [] if v.stale else spans.span_texts(v.paragraph.content, v.spans)
+        rule = rules.get(v.rule_id) or "(rule removed)"
+        if texts:
+            issues.append(f"- Rule: {rule}\n  Offending text: " + "; ".join(f'"{text}"' for text in texts))
+        else:
+            issues.append(f"- Rule: {rule}\n  Finding: {v.highlighted_text}")
+    return "\n".join(issues)
+
+
+def fix_mode(mode: str | None = None) -> str:
+    """"spans" (replace only the offending spans) or "rewrite" (rewrite the whole paragraph)."""
+    return mode or os.getenv("FIX_MODE") or "spans"
+
+
+async def span_fix(db: Session, violations: list) -> dict | None:
+    """
+    Fix a paragraph by replacing only the spans its violations point at.
+
+    Spans of overlapping violations are merged into one region, the model
+    returns one replacement per region, and they are applied locally.
+
+    Returns:
+        dict | None: {"suggested_fix", "edits"}, or None when a span-level
+        fix isn't possible (a violation has no usable spans, or the answer didn't parse)
+        and the paragraph should be rewritten instead.
+    """
+    paragraph = violations[0].paragraph.content
+    rules = await asyncio.to_thread(rule_descriptions, db, violations)
+    targets = []
+    for v in violations:
+        if spans.is_negative(v.highlighted_text):
+            continue
+        if v.stale or not v.spans:
+            return None
+        targets.append((v.id, rules.get(v.rule_id) or "(rule removed)", v.spans))
+    if not targets:
+        return None
+
+    regions = spans.fix_regions(paragraph, targets)
+    replacements = await workflow.get_span_fixes(paragraph, regions)
+    if replacements is None:
+        return None
+
+    edits = [
+        {"start": region["start"], "end": region["end"], "original": region["text"],
+         "replacement": replacement, "violation_ids": region["violation_ids"]}
+        for region, replacement in zip(regions, replacements)
+    ]
+    return {"suggested_fix": spans.apply_edits(paragraph, edits), "edits": edits}
+
+
+def mark_paragraph_stale(db: Session, paragraph_id: int):
+    """Flag every stored result for a paragraph whose text is changing. Does not commit."""
+    db.query(models.Violation).filter(models.Violation.paragraph_id == paragraph_id).update(
+        {models.Violation.stale: True}, synchronize_session=False
+    )
+
+
+def mark_rule_stale(db: Session, rule_id: int):
+    """Flag every stored result for a rule whose text is changing. Does not commit."""
+    db.query(models.Violation).filter(models.Violation.rule_id == rule_id).update(
+        {models.Violation.stale: True}, synchronize_session=False
+    )
+
+
+async def recheck_document(db: Session, document_id: int, concurrency: int | None = None,
+                           pack_size: int | None = None, on_progress=None) -> dict:
+    """
+    Re-evaluate only the stale (paragraph, rule) pairs of a document, and
+    those checked with older prompt templates, and overwrite their stored
+    results in place.
+
+    Returns:
+        dict: Run summary (counts and elapsed time).
+    """
+    started = time.perf_counter()
+    version = prompts.check_version()
+    outdated = or_(models.Violation.stale.is_(True), models.Violation.template_version.is_distinct_from(version))
+
+    with metrics.stage("recheck_document", "db"):
+        stale_pairs = await asyncio.to_thread(db.query(
+            models.Paragraph.id, models.Paragraph.content, models.ComplianceRule.id, models.ComplianceRule.description
+        ).select_from(models.Violation).join(
+            models.Paragraph, models.Violation.paragraph_id == models.Paragraph.id
+        ).join(
+            models.ComplianceRule, models.Violation.rule_id == models.ComplianceRule.id
+        ).filter(
+            models.Paragraph.document_id == document_id, outdated
+        ).distinct().all)
+
+    paragraphs = {}
+    candidates = {}
+    for paragraph_id, content, rule_id, description in stale_pairs:
+        paragraphs[paragraph_id] = content
+        candidates.setdefault(paragraph_id, []).append((rule_id, description))
+
+    with metrics.stage("recheck_document", "llm"), scheduler.priority(scheduler.BATCH):
+        results = await workflow.evaluate_matrix(
+            list(paragraphs.items()), [], concurrency, pack_size, on_progress, candidates
+        )
+
+    def persist() -> list[dict]:
+        rows = [
+            {"p_id": paragraph_id, "r_id": rule_id, "text": result,
+             "spans": spans.violation_spans(paragraphs[paragraph_id], result)}
+            for paragraph_id, rule_id, result in results
+            if not isinstance(result, Exception)
+        ]
+        if rows:
+            violations = models.Violation.__table__
+            db.connection().execute(
+                update(violations).where(
+                    violations.c.paragraph_id == bindparam("p_id"),
+                    violations.c.rule_id == bindparam("r_id"),
+                    or_(violations.c.stale.is_(True), violations.c.template_version.is_distinct_from(version)),
+                ).values(
+                    highlighted_text=bindparam("text"), spans=bindparam("spans"), template_version=version,
+                    suggested_fix=None, stale=False,
+                ),
+                rows,
+            )
+        db.commit()
+        return rows
+
+    with metrics.stage("recheck_document", "persist"):
+        rows = await asyncio.to_thread(persist)
+
+    return {
+        "document_id": document_id,
+        "stale_pairs": len(stale_pairs),
+        "rechecked": len(rows),
+        "failed": len(results) - len(rows),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def dedup_threshold(threshold: float | None = None) -> float:
+    """Similarity at which stored rules count as duplicates; defaults to RULES_DEDUP_THRESHOLD."""
+    if threshold is not None:
+        return threshold
+    return float(os.getenv("RULES_DEDUP_THRESHOLD") or "0.8")
+
+
+def rule_index(db: Session, threshold: float | None = None) -> dedup.RuleIndex:
+    """Near-duplicate index over every stored rule, keyed by rule id."""
+    index = dedup.RuleIndex(dedup_threshold(threshold))
+    for rule_id, description in db.query(models.ComplianceRule.id, models.ComplianceRule.description):
+        index.add(rule_id, description)
+    return index
+
+
+async def generate_rules(db: Session, text: str, chunk_tokens: int | None = None) -> dict:
+    """
+    Extract compliance rules from a policy text and store them as ComplianceRule rows.
+    Rules that near-duplicate a stored rule (or an earlier rule in this batch) are
+    merged into it instead of being inserted.
+    """
+    with metrics.stage("generate_rules", "llm"), scheduler.priority(scheduler.BATCH):
+        rules = await workflow.extract_compliance_rules(text, chunk_tokens)
+
+    with metrics.stage("generate_rules", "db"):
+        index = await asyncio.to_thread(rule_index, db)
+    new_rules = []
+    for i, rule in enumerate(rules):
+        if index.find(rule) is None:
+            index.add(("new", i), rule)
+            new_rules.append(rule)
+    def persist():
+        bulk.insert_rules(db, new_rules)
+        db.commit()
+
+    with metrics.stage("generate_rules", "persist"):
+        await asyncio.to_thread(persist)
+    return {"rules": rules, "created": len(new_rules), "merged": len(rules) - len(new_rules)}
+
+
+def compact_rules(db: Session, threshold: float | None = None, dry_run: bool = False) -> dict:
+    """
+    Merge near-duplicate stored rules: each group keeps its lowest id, violations
+    pointing at the duplicates are re-pointed to it, and the duplicates are deleted.
+    """
+    rules = db.query(models.ComplianceRule.id, models.ComplianceRule.description).all()
+    groups = dedup.find_duplicate_groups(rules, dedup_threshold(threshold))
+    duplicate_ids = [rule_id for ids in groups.values() for rule_id in ids]
+
+    if not dry_run:
+        for canonical_id, ids in groups.items():
+            db.query(models.Violation).filter(models.Violation.rule_id.in_(ids)).update(
+                {models.Violation.rule_id: canonical_id}, synchronize_session=False
+            )
+        if duplicate_ids:
+            db.query(models.ComplianceRule).filter(models.ComplianceRule.id.in_(duplicate_ids)).delete(
+                synchronize_session=False
+            )
+        db.commit()
+
+    return {
+        "groups": {str(canonical_id): ids for canonical_id, ids in groups.items()},
+        "removed": len(duplicate_ids),
+        "remaining": len(rules) - len(duplicate_ids),
+        "dry_run": dry_run,
+    }
+
+
+async def check_document(db: Session, document_id: int, rule_ids: list[int] | None = None,
+                         concurrency: int | None = None, pack_size: int | None = None,
+                         on_progress=None, exhaustive: bool | None = None, top_k: int | None = None,
+                         min_score: float | None = None) -> dict:
+    """
+    Run every rule in the set against every paragraph of a document and persist the results.
+    Pairs that already have a current result are skipped; outdated results of the
+    pairs checked are replaced.
+
+    Args:
+        db (Session): Open database session.
+        document_id (int): Document whose paragraphs are checked.
+        rule_ids (list[int] | None): Rules to apply; all rules when None.
+        concurrency (int | None): Max LLM calls in flight.
+        pack_size (int | None): Rules evaluated per prompt.
+        on_progress (callable | None): Called as on_progress(done, total) as pairs complete.
+        exhaustive (bool | None): Skip the relevance pre-filter and check every pair;
+            defaults to PREFILTER_ENABLED being false.
+        top_k (int | None): Max candidate rules per paragraph when pre-filtering.
+        min_score (float | None): Minimum relevance score when pre-filtering.
+
+    Returns:
+        dict: Run summary (counts and elapsed time).
+    """
+    started = time.perf_counter()
+
+    def load():
+        paragraphs = db.query(models.Paragraph.id, models.Paragraph.content, models.Paragraph.content_hash).filter(
+            models.Paragraph.document_id == document_id
+        ).order_by(models.Paragraph.position).all()
+
+        rule_query = db.query(models.ComplianceRule.id, models.ComplianceRule.description)
+        if rule_ids is not None:
+            rule_query = rule_query.filter(models.ComplianceRule.id.in_(rule_ids))
+
+        # Results this document already has for these rules, current or not
+        existing = db.query(
+            models.Violation.id, models.Violation.paragraph_id, models.Violation.rule_id,
+            models.Violation.stale, models.Violation.template_version,
+        ).join(models.Violation.paragraph).filter(models.Paragraph.document_id == document_id)
+        if rule_ids is not None:
+            existing = existing.filter(models.Violation.rule_id.in_(rule_ids))
+        return paragraphs, rule_query.order_by(models.ComplianceRule.id).all(), existing.all()
+
+    with metrics.stage("check_document", "db"):
+        paragraphs, rules, existing = await asyncio.to_thread(load)
+
+    # Pairs with a current result are left alone; outdated rows of the others are
+    # replaced by this run's result instead of gaining a duplicate next to it
+    version = prompts.check_version()
+    current = set()
+    outdated = {}
+    for violation_id, paragraph_id, rule_id, stale, template_version in existing:
+        if not stale and template_version == version:
+            current.add((paragraph_id, rule_id))
+        else:
+            outdated.setdefault((paragraph_id, rule_id), []).append(violation_id)
+
+    # Evaluate each distinct paragraph text once, via its first occurrence
+    paragraph_ids_by_hash = {}
+    representatives = []
+    for paragraph_id, content, content_hash in paragraphs:
+        key = content_hash or parser.content_hash(content)
+        if key not in paragraph_ids_by_hash:
+            paragraph_ids_by_hash[key] = []
+            representatives.append((key, content))
+        paragraph_ids_by_hash[key].append(paragraph_id)
+
+    if exhaustive is None:
+        exhaustive = (os.getenv("PREFILTER_ENABLED") or "true").lower() != "true"
+    with metrics.stage("check_document", "prefilter"):
+        if exhaustive:
+            candidates = {key: list(rules) for key, _ in representatives}
+        else:
+            # BM25 over the whole paragraph x rule matrix is pure Python; keep it off the event loop
+            candidates = await asyncio.to_thread(
+                workflow.select_candidate_rules, representatives, rules, top_k, min_score
+            )
+    up_to_date = 0
+    for key, paragraph_rules in candidates.items():
+        pending = []
+        for rule_id, description in paragraph_rules:
+            done = sum((paragraph_id, rule_id) in current for paragraph_id in paragraph_ids_by_hash[key])
+            up_to_date += done
+            if done < len(paragraph_ids_by_hash[key]):
+                pending.append((rule_id, description))
+        candidates[key] = pending
+
+    # Reuse current results already computed for the same text in other documents
+    with metrics.stage("check_document", "db"):
+        prior = await asyncio.to_thread(
+            prior_results, db, document_id, list(candidates), [rule_id for rule_id, _ in rules]
+        )
+    reused = {}
+    for key, paragraph_rules in candidates.items():
+        pending = []
+        for rule_id, description in paragraph_rules:
+            if (key, rule_id) in prior:
+                reused[(key, rule_id)] = prior[(key, rule_id)]
+            else:
+                pending.append((rule_id, description))
+        candidates[key] = pending
+
+    with metrics.stage("check_document", "llm"), scheduler.priority(scheduler.BATCH):
+        results = await workflow.evaluate_matrix(
+            representatives, rules, concurrency, pack_size, on_progress, candidates
+        )
+    outcomes = [(key, rule_id, result) for key, rule_id, result in results]
+    outcomes += [(key, rule_id, text) for (key, rule_id), text in reused.items()]
+
+    def persist() -> tuple[list[dict], int]:
+        # Offsets are per paragraph: duplicates may differ in case and whitespace
+        content_by_id = {paragraph_id: content for paragraph_id, content, _ in paragraphs}
+        rows = []
+        replaced = []
+        failed = 0
+        for key, rule_id, result in outcomes:
+            for paragraph_id in paragraph_ids_by_hash[key]:
+                if (paragraph_id, rule_id) in current:
+                    continue
+                if isinstance(result, Exception):
+                    failed += 1
+                else:
+                    rows.append({
+                        "paragraph_id": paragraph_id, "rule_id": rule_id, "highlighted_text": result,
+                        "spans": spans.violation_spans(content_by_id[paragraph_id], result),
+                        "template_version": version,
+                    })
+                    replaced += outdated.get((paragraph_id, rule_id), [])
+        for i in range(0, len(replaced), 1000):
+            db.query(models.Violation).filter(models.Violation.id.in_(replaced[i:i + 1000])).delete(
+                synchronize_session=False
+            )
+        if rows:
+            db.execute(insert(models.Violation), rows)
+        db.commit()
+        return rows, failed
+
+    # Span alignment and the executemany insert cover the whole matrix; keep them off the event loop
+    with metrics.stage("check_document", "persist"):
+        rows, failed = await asyncio.to_thread(persist)
+
+    checks = len(rows) + failed
+    return {
+        "document_id": document_id,
+        "paragraphs": len(paragraphs),
+        "unique_paragraphs": len(representatives),
+        "rules": len(rules),
+        "checks": checks,
+        "up_to_date": up_to_date,
+        "skipped": len(paragraphs) * len(rules) - checks - up_to_date,
+        "evaluated": len(results),
+        "reused": sum(len(paragraph_ids_by_hash[key]) for key, _ in reused),
+        "dedup_ratio": round(1 - len(results) / checks, 4) if checks else 0.0,
+        "violations_written": len(rows),
+        "failed": failed,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,129 @@
+# backend/core/prompts.py
+import hashlib
+import os
+
+from core.endpoints import model_id
+
+
+def use_system_message() -> bool:
+    """Whether instructions go in a system message (PROMPT_SYSTEM_MESSAGE, default true)."""
+    return (os.getenv("PROMPT_SYSTEM_MESSAGE") or "true").lower() == "true"
+
+
+class PromptTemplate:
+    """
+    A prompt: static `system` instructions plus a `user` format string.
+
+    The template id is derived from both texts, so editing either one changes
+    it. It is part of every cache key built from the template and is stored
+    on check results, so answers produced with an older wording are not reused.
+    """
+
+    def __init__(self, name: str, system: str, user: str):
+        self.name = name
+        self.system = system
+        self.user = user
+
+    @property
+    def id(self) -> str:
+        digest = hashlib.sha256(f"{self.system}\x1f{self.user}".encode("utf-8")).hexdigest()
+        return f"{self.name}-{digest[:12]}"
+
+    def cache_id(self, split_system: bool | None = None) -> str:
+        """Template id plus the message layout, which also changes what the model sees."""
+        if split_system is None:
+            split_system = use_system_message()
+        return f"{self.id}-{'system' if split_system else 'inline'}"
+
+    def messages(self, split_system: bool | None = None, **fields) -> list[dict]:
+        """
+        Chat messages for this template.
+
+        Instructions come first and the per-call fields last (rules before the
+        paragraph), so calls sharing a template share a prompt prefix the
+        inference server can serve from its prefix cache. Without
+        `split_system` the instructions open a single user message instead of
+        a system message, for models that ignore the system role.
+
+        Args:
+            split_system (bool | None): Send instructions as a system message;
+                defaults to PROMPT_SYSTEM_MESSAGE.
+            **fields: Values for the placeholders in `user`.
+
+        Returns:
+            list[dict]: OpenAI-style chat messages.
+        """
+        if split_system is None:
+            split_system = use_system_message()
+        user = self.user.format(**fields)
+        if split_system:
+            return [{"role": "system", "content": self.system}, {"role": "user", "content": user}]
+        return [{"role": "user", "content": f"{self.system}\n\n{user}"}]
+
+
+_templates: dict[str, PromptTemplate] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    """Add a template, replacing any registered under the same name."""
+    _templates[template.name] = template
+    return template
+
+
+def get_template(name: str) -> PromptTemplate:
+    return _templates[name]
+
+
+def versions() -> dict[str, str]:
+    """Current template id per name."""
+    return {name: template.id for name, template in _templates.items()}
+
+
+def check_version() -> str:
+    """
+    Version stamp for violation verdicts. A verdict may come from the single
+    or the packed check prompt, so it covers both, in the current layout, and
+    the model that answers them.
+    """
+    templates = "+".join(get_template(name).cache_id() for name in ("check", "check-packed"))
+    return f"{templates}@{model_id()}"
+
+
+register(PromptTemplate(
+    "check",
+    system="""You are a compliance reviewer. You are given a rule and a paragraph; decide whether the paragraph violates the rule.
+If it does, quote the problematic text from the paragraph exactly, in double quotes, and briefly say why.
+If it does not, answer "No violation found." and nothing else.""",
+    user="Rule: {rule}\n\nParagraph:\n{paragraph}",
+))
+
+register(PromptTemplate(
+    "check-packed",
+    system="""You are a compliance reviewer. For each numbered rule, decide whether the paragraph violates it.
+Respond with a JSON array only, one object per rule, in the form
+{"rule": <rule number>, "violated": true or false, "problematic_text": "<offending text quoted exactly, and why, or empty>"}.""",
+    user="Rules:\n{rules}\n\nParagraph:\n{paragraph}",
+))
+
+register(PromptTemplate(
+    "fix",
+    system="""You are a compliance editor. You are given the issues identified in a paragraph, then the paragraph.
+Rewrite the paragraph to address all the issues. Return only the improved version of the paragraph.""",
+    user="Issues:\n{issues}\n\nParagraph:\n{paragraph}",
+))
+
+register(PromptTemplate(
+    "fix-spans",
+    system="""You are a compliance editor. Each numbered passage is quoted from the paragraph that follows and breaks the rules listed with it.
+Rewrite only those passages so they comply, keeping each one consistent with the text around it.
+Respond with a JSON array only, one object per passage, in the form
+{"passage": <passage number>, "replacement": "<rewritten passage>"}.""",
+    user="Passages:\n{passages}\n\nParagraph:\n{paragraph}",
+))
+
+register(PromptTemplate(
+    "rules",
+    system="""You are a compliance officer. Given a policy document or guideline, extract a concise list of explicit compliance rules.
+Each rule should be clear, actionable, and self-contained. Return only the rules, one per line, with no other text.""",
+    user="Document:\n{document}",
+))
@@ -0,0 +1,65 @@
+# backend/core/relevance.py
+import math
+import re
+from collections import Counter
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SUFFIXES = ("ations", "ation", "ions", "ion", "ings", "ing", "ies", "ed", "es", "ly", "s")
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been before being below between both but by can
+could did do does doing during each either for from further had has have having here how if in into is
+it its itself may more most must no nor not of off on once only or other our out over own same shall
+should so some such than that the their them then there these they this those through to too under
+until up upon very was we were what when where which while who whom why will with within without would
+""".split())
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased, stopword-free, crudely stemmed terms (so encrypt/encrypted/encryption match)."""
+    return [_stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a small corpus held in memory.
+
+    Built once per run over the rule set, then queried with each paragraph,
+    which is cheap enough to score every (paragraph, rule) pair locally
+    before deciding which ones are worth an LLM call.
+    """
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(document)) for document in documents]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq = Counter(term for tf in self.term_freqs for term in tf)
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def scores(self, query: str) -> list[float]:
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        results = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+    def top(self, query: str, k: int, min_score: float = 0.0) -> list[int]:
+        """Indices of the best `k` documents scoring above `min_score`, best first."""
+        scored = [(score, i) for i, score in enumerate(self.scores(query)) if score > min_score]
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [i for _, i in scored[:k]]
@@ -0,0 +1,260 @@
+# backend/core/scheduler.py
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from time import monotonic
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BATCH = 1
+
+_priority = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    """Run LLM calls made inside the block (including tasks spawned from it) at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class PrioritySlots:
+    """
+    Concurrency limit that hands out slots by LLM priority.
+
+    Waiting calls get freed slots interactive first (FIFO within a priority),
+    and `reserved` slots are only ever given to interactive calls, so a full
+    batch backlog cannot hold every slot when an interactive call arrives.
+    """
+
+    def __init__(self, size: int, reserved: int = 0):
+        self.size = max(1, size)
+        self.reserved = max(0, min(reserved, self.size - 1))
+        self._in_use = 0
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def _limit(self, level: int) -> int:
+        return self.size if level == INTERACTIVE else self.size - self.reserved
+
+    def queue_depth(self) -> dict:
+        depth = {"interactive": 0, "batch": 0}
+        for level, _, waiter in self._waiting:
+            if not waiter.done():
+                depth["interactive" if level == INTERACTIVE else "batch"] += 1
+        return depth
+
+    def _grant(self):
+        while self._waiting:
+            level, _, waiter = self._waiting[0]
+            if waiter.done():
+                heapq.heappop(self._waiting)
+            elif self._in_use < self._limit(level):
+                heapq.heappop(self._waiting)
+                self._in_use += 1
+                waiter.set_result(None)
+            else:
+                break
+
+    async def acquire(self):
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (_priority.get(), next(self._seq), waiter))
+        self._grant()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we were cancelled; pass the slot on
+                self.release()
+            raise
+
+    def release(self):
+        self._in_use -= 1
+        self._grant()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class UpstreamError(Exception):
+    """The inference server answered with an error status."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float | None = None):
+        super().__init__(f"LLM server returned {status_code}: {detail}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code == 429 or self.status_code >= 500
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler:
+    """
+    Admission control in front of the LLM client.
+
+    Tracks requests and tokens started in the last 60 seconds against
+    requests-per-minute and tokens-per-minute budgets (0 disables a budget),
+    admits waiting calls in priority order (interactive before batch, FIFO
+    within a priority), pauses all admissions after a 429 for the server's
+    Retry-After, and retries retryable failures with jittered exponential
+    backoff.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._window = deque()
+        self._window_tokens = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cooldown_until = 0.0
+        self._changed = asyncio.Condition()
+
+    def queue_depth(self) -> dict:
+        depth = {"interactive": 0, "batch": 0}
+        for level, _ in self._waiting:
+            depth["interactive" if level == INTERACTIVE else "batch"] += 1
+        return depth
+
+    def _prune(self, now: float):
+        while self._window and self._window[0][0] <= now - 60:
+            _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+
+    def _budget_wait(self, tokens: int, now: float) -> float:
+        """Seconds until a call of `tokens` fits both budgets (0 when it fits now)."""
+        wait = max(0.0, self._cooldown_until - now)
+        if self.rpm and len(self._window) >= self.rpm:
+            wait = max(wait, self._window[len(self._window) - self.rpm][0] + 60 - now)
+        if self.tpm and self._window and self._window_tokens + tokens > self.tpm:
+            # Wait for enough of the oldest calls to age out of the window
+            freed = 0
+            for started, used in self._window:
+                freed += used
+                if self._window_tokens - freed + tokens <= self.tpm:
+                    wait = max(wait, started + 60 - now)
+                    break
+            else:
+                wait = max(wait, self._window[-1][0] + 60 - now)
+        return wait
+
+    async def acquire(self, tokens: int):
+        """Wait until this call may start, then charge it to the budgets."""
+        entry = (_priority.get(), next(self._seq))
+        heapq.heappush(self._waiting, entry)
+        async with self._changed:
+            try:
+                while True:
+                    now = monotonic()
+                    self._prune(now)
+                    timeout = None
+                    if self._waiting[0] == entry:
+                        timeout = self._budget_wait(tokens, now)
+                        if timeout <= 0:
+                            heapq.heappop(self._waiting)
+                            self._window.append((now, tokens))
+                            self._window_tokens += tokens
+                            self._changed.notify_all()
+                            return
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._changed.notify_all()
+                raise
+
+    def retry_delay(self, attempt: int, error: Exception) -> float | None:
+        """Delay before retry number `attempt + 1`, or None if `error` should be raised."""
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, UpstreamError) and not error.retryable:
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.backoff_base)
+            self._cooldown_until = max(self._cooldown_until, monotonic() + retry_after)
+        return delay
+
+    async def run(self, call, tokens: int):
+        """Run `await call()` under the budgets, retrying retryable failures."""
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            try:
+                return await call()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                delay = self.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                logger.warning("LLM call failed (%s); retry %d in %.1fs", e, attempt + 1, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, UpstreamError):
+        return error.retryable
+    return isinstance(error, httpx.TransportError)
+
+
+def scheduler_from_env() -> Scheduler:
+    return Scheduler(
+        rpm=int(os.getenv("LLM_RPM_LIMIT") or "0"),
+        tpm=int(os.getenv("LLM_TPM_LIMIT") or "0"),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES") or "5"),
+        backoff_base=float(os.getenv("LLM_BACKOFF_BASE") or "1"),
+        backoff_max=float(os.getenv("LLM_BACKOFF_MAX") or "60"),
+    )
+
+
+_scheduler: Scheduler | None = None
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = scheduler_from_env()
+    return _scheduler
@@ -0,0 +1,193 @@
+# backend/core/spans.py
+import re
+from functools import lru_cache
+
+_SENTENCE = re.compile(r"[^.!?;\n]+(?:[.!?;]+[\"')\]”’]*|\n|$)")
+_WORD = re.compile(r"\w+")
+_QUOTED = re.compile(
+    r"\"([^\"]{4,})\"|“([^”]{4,})”|(?<!\w)'([^']{4,}?)'(?!\w)|‘([^’]{4,})’|`([^`]{4,})`"
+)
+_ELLIPSIS = re.compile(r"\s*(?:\.{3}|…)\s*")
+_NEGATIVE = re.compile(r"^\W*(?:no\b|none\b|not a violation|there is no violation|does not violate)", re.IGNORECASE)
+_QUOTE_CHARS = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+# Share of a quote's (or sentence's) words that must match for a fuzzy alignment
+MIN_OVERLAP = 0.6
+
+
+@lru_cache(maxsize=4096)
+def sentence_index(text: str) -> tuple[tuple[int, int], ...]:
+    """Character offsets (start, end) of each sentence or clause of `text`, whitespace trimmed."""
+    index = []
+    for match in _SENTENCE.finditer(text):
+        start, end = match.span()
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            index.append((start, end))
+    return tuple(index)
+
+
+def _normalize(text: str) -> tuple[str, list[int]]:
+    """Casefolded, whitespace-collapsed text plus the original offset of every normalized character."""
+    chars = []
+    offsets = []
+    previous_space = True
+    for i, char in enumerate(text.translate(_QUOTE_CHARS)):
+        if char.isspace():
+            if previous_space:
+                continue
+            char = " "
+            previous_space = True
+        else:
+            previous_space = False
+        for folded in char.casefold():
+            chars.append(folded)
+            offsets.append(i)
+    return "".join(chars), offsets
+
+
+def _words(text: str) -> set[str]:
+    return set(_WORD.findall(text.casefold()))
+
+
+def quotes_in(answer: str) -> list[str]:
+    """Text the model quoted from the paragraph, split at ellipses."""
+    quotes = []
+    for match in _QUOTED.finditer(answer):
+        quoted = next(group for group in match.groups() if group)
+        quotes.extend(piece for piece in _ELLIPSIS.split(quoted) if len(piece.strip()) >= 4)
+    return quotes
+
+
+def _find_exact(paragraph: str, quote: str) -> tuple[int, int] | None:
+    normalized, offsets = _normalize(paragraph)
+    needle, _ = _normalize(quote.strip().strip(".,;:"))
+    needle = needle.strip()
+    if not needle:
+        return None
+    at = normalized.find(needle)
+    if at < 0:
+        return None
+    return offsets[at], offsets[at + len(needle) - 1] + 1
+
+
+def _find_sentence(paragraph: str, words: set[str], by_quote: bool) -> tuple[int, int] | None:
+    """Best sentence by word overlap: share of the quote's words (or of the sentence's words) found."""
+    best, best_score = None, MIN_OVERLAP
+    for start, end in sentence_index(paragraph):
+        sentence_words = _words(paragraph[start:end])
+        if not sentence_words or not words:
+            continue
+        shared = len(words & sentence_words)
+        score = shared / len(words) if by_quote else shared / len(sentence_words)
+        if score >= best_score:
+            best, best_score = (start, end), score
+    return best
+
+
+def _merge(spans: list[tuple[int, int]]) -> list[list[int]]:
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def is_negative(answer: str | None) -> bool:
+    """True for a "no violation" verdict."""
+    return not answer or bool(_NEGATIVE.match(answer))
+
+
+def violation_spans(paragraph: str, answer: str | None) -> list[list[int]]:
+    """
+    Align a model's verdict against the paragraph it judged.
+
+    Quoted text is matched exactly (ignoring case, whitespace and quote
+    style), falling back to the sentence sharing most of its words. An
+    answer with no quotes is matched sentence by sentence, keeping
+    sentences it mostly restates. Negative verdicts have no spans.
+
+    Returns:
+        list[list[int]]: Sorted, non-overlapping [start, end) character offsets into `paragraph`.
+    """
+    if not paragraph or is_negative(answer):
+        return []
+    spans = []
+    quotes = quotes_in(answer)
+    for quote in quotes:
+        span = _find_exact(paragraph, quote) or _find_sentence(paragraph, _words(quote), by_quote=True)
+        if span:
+            spans.append(span)
+    if not quotes:
+        answer_words = _words(answer)
+        for start, end in sentence_index(paragraph):
+            sentence_words = _words(paragraph[start:end])
+            if sentence_words and len(sentence_words & answer_words) / len(sentence_words) >= MIN_OVERLAP:
+                spans.append((start, end))
+    return _merge(spans)
+
+
+def span_texts(paragraph: str, spans: list[list[int]] | None) -> list[str]:
+    return [paragraph[start:end] for start, end in spans or []]
+
+
+def fix_regions(paragraph: str, violation_spans: list[tuple[int, str, list[list[int]]]]) -> list[dict]:
+    """
+    The regions of `paragraph` a span-level fix rewrites, one per group of
+    overlapping spans. Spans of different violations that overlap are merged
+    into a single region carrying every rule involved, so their replacements
+    can never conflict.
+
+    Args:
+        violation_spans: (violation id, rule description, spans) per violation.
+
+    Returns:
+        list[dict]: {"start", "end", "text", "rules", "violation_ids"} in paragraph order.
+    """
+    items = sorted(
+        (start, end, violation_id, rule)
+        for violation_id, rule, spans in violation_spans
+        for start, end in spans or []
+        if 0 <= start < end <= len(paragraph)
+    )
+    regions = []
+    for start, end, violation_id, rule in items:
+        if regions and start < regions[-1]["end"]:
+            region = regions[-1]
+            region["end"] = max(region["end"], end)
+        else:
+            region = {"start": start, "end": end, "rules": [], "violation_ids": []}
+            regions.append(region)
+        if rule not in region["rules"]:
+            region["rules"].append(rule)
+        if violation_id not in region["violation_ids"]:
+            region["violation_ids"].append(violation_id)
+    for region in regions:
+        region["text"] = paragraph[region["start"]:region["end"]]
+    return regions
+
+
+def apply_edits(paragraph: str, edits: list[dict]) -> str:
+    """
+    Apply non-overlapping {"start", "end", "replacement"} edits to `paragraph`,
+    e.g. one per region from fix_regions.
+
+    Raises:
+        ValueError: if two edits overlap or an edit falls outside the paragraph.
+    """
+    parts = []
+    last = 0
+    for edit in sorted(edits, key=lambda edit: (edit["start"], edit["end"])):
+        start, end = edit["start"], edit["end"]
+        if start < last or end > len(paragraph):
+            raise ValueError(f"Edit [{start}, {end}) overlaps another edit or leaves the paragraph")
+        parts.append(paragraph[last:start])
+        parts.append(edit["replacement"])
+        last = end
+    parts.append(paragraph[last:])
+    return "".join(parts)
@@ -0,0 +1,100 @@
+# backend/core/sse.py
+import codecs
+import json
+import logging
+import re
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+_DATA_PREFIX = "data:"
+_DONE = "[DONE]"
+_FENCE = re.compile(r'^```json\n|```$', flags=re.MULTILINE)
+
+
+class SSEDecoder:
+    """
+    Incremental decoder for OpenAI-style chat completion event streams.
+
+    Bytes are fed in as they arrive; only complete lines are decoded and any
+    trailing partial line (or split UTF-8 sequence) is carried over to the next
+    chunk, so memory use is bounded by the chunk size rather than the whole
+    response. All events completed by a chunk are parsed with a single
+    `json.loads` call, falling back to per-event parsing if one is malformed.
+    """
+
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+
+    def feed(self, chunk: bytes) -> list[str]:
+        """Decode every complete line in `chunk` and return the content deltas found."""
+        if not chunk:
+            return []
+        lines = (self._pending + self._utf8.decode(chunk)).split("\n")
+        self._pending = lines.pop()
+        return self._decode_lines(lines)
+
+    def flush(self) -> list[str]:
+        """Decode a final line that was not newline-terminated."""
+        line, self._pending = self._pending + self._utf8.decode(b"", final=True), ""
+        return self._decode_lines([line])
+
+    def _decode_lines(self, lines: list[str]) -> list[str]:
+        payloads = []
+        for line in lines:
+            line = line.strip()
+            if line.startswith(_DATA_PREFIX):
+                data = line[len(_DATA_PREFIX):].strip()
+                if data and data != _DONE:
+                    payloads.append(data)
+        if not payloads:
+            return []
+
+        try:
+            events = json.loads("[" + ",".join(payloads) + "]")
+        except json.JSONDecodeError:
+            events = []
+            for data in payloads:
+                try:
+                    events.append(json.loads(data))
+                except json.JSONDecodeError as e:
+                    logger.warning("Failed to decode SSE event: %r (%s)", data[:200], e)
+
+        contents = []
+        for event in events:
+            try:
+                content = event['choices'][0]['delta'].get('content')
+            except (KeyError, IndexError, TypeError, AttributeError):
+                continue
+            if content:
+                contents.append(content)
+        return contents
+
+
+def iter_content(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Yield content deltas from an iterable of raw SSE byte chunks."""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.flush()
+
+
+async def aiter_content(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Async variant of iter_content, e.g. over httpx `Response.aiter_bytes()`."""
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        for content in decoder.feed(chunk):
+            yield content
+    for content in decoder.flush():
+        yield content
+
+
+def strip_fences(content: str) -> str:
+    """Remove the ```json fences models like to wrap structured answers in."""
+    return _FENCE.sub('', content.strip())
+
+
+def collect(chunks: Iterable[bytes]) -> str:
+    """Assemble the full completion text from SSE chunks, stripping ```json fences."""
+    return strip_fences("".join(iter_content(chunks)))
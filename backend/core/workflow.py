@@ -1,21 +1,160 @@
 # backend/core/workflow.py
+import asyncio
 import logging
-from core.llm import check_violation, suggest_fix, generate_compliance_rules, general_llm_query
+import os
+from core.llm import (
+    check_violation, check_violations_packed, suggest_fix, generate_compliance_rules, general_llm_query,
+    stream_suggest_fix, stream_general_llm_query, suggest_span_fixes
+)
+from core.relevance import BM25Index
+from core import parser
+from core.dedup import dedupe_rules
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def evaluate_paragraph(paragraph, rule_description):
-    result = check_violation(paragraph, rule_description)
+async def evaluate_paragraph(paragraph, rule_description):
+    result = await check_violation(paragraph, rule_description)
     return result
 
-def get_fix_suggestion(paragraph: str, violation_context: str) -> str:
-    return suggest_fix(paragraph, violation_context)
+async def evaluate_paragraph_packed(paragraph, rule_descriptions):
+    """
+    Evaluate one paragraph against several rules in a single LLM call,
+    falling back to one call per rule if the packed answer can't be parsed.
+    """
+    if len(rule_descriptions) == 1:
+        return [await evaluate_paragraph(paragraph, rule_descriptions[0])]
+    try:
+        return await check_violations_packed(paragraph, rule_descriptions)
+    except ValueError as e:
+        logger.warning("Packed check unparseable, falling back to per-rule calls: %s", e)
+        return list(await asyncio.gather(*(
+            evaluate_paragraph(paragraph, description) for description in rule_descriptions
+        )))
 
-def get_compliance_rules(document):
-    return  generate_compliance_rules(document)
+async def get_fix_suggestion(paragraph: str, violation_context: str) -> str:
+    return await suggest_fix(paragraph, violation_context)
 
-def get_llm_response(query):
-    return general_llm_query(query)
+def stream_fix_suggestion(paragraph: str, violation_context: str):
+    return stream_suggest_fix(paragraph, violation_context)
 
+async def get_span_fixes(paragraph: str, regions: list[dict]) -> list[str] | None:
+    """Replacements for the given regions of a paragraph, or None if the model's answer can't be parsed."""
+    try:
+        return await suggest_span_fixes(paragraph, regions)
+    except ValueError as e:
+        logger.warning("Span fix unparseable, falling back to a paragraph rewrite: %s", e)
+        return None
 
+async def get_compliance_rules(document):
+    return await generate_compliance_rules(document)
+
+async def extract_compliance_rules(text: str, chunk_tokens=None, concurrency=None) -> list[str]:
+    """
+    Map-reduce rule extraction: split the policy into token-budgeted windows on
+    paragraph boundaries, extract rules from each window concurrently, then
+    drop near-duplicate rules locally. Short policies take a single call.
+
+    Args:
+        text (str): Policy document text.
+        chunk_tokens (int | None): Token budget per window; defaults to RULES_CHUNK_TOKENS.
+        concurrency (int | None): Max windows in flight; defaults to CHECK_CONCURRENCY.
+
+    Returns:
+        list[str]: Deduplicated rules in document order.
+    """
+    if chunk_tokens is None:
+        chunk_tokens = int(os.getenv("RULES_CHUNK_TOKENS") or "3000")
+    chunks = parser.chunk_by_token_budget(parser.break_into_paragraphs(text), chunk_tokens)
+    if len(chunks) <= 1:
+        return await generate_compliance_rules(text)
+
+    limit = asyncio.Semaphore(concurrency or int(os.getenv("CHECK_CONCURRENCY") or "16"))
+
+    async def extract(chunk):
+        async with limit:
+            return await generate_compliance_rules(chunk)
+
+    logger.info("Extracting rules from %d chunks", len(chunks))
+    extracted = await asyncio.gather(*(extract(chunk) for chunk in chunks))
+    threshold = float(os.getenv("RULES_DEDUP_THRESHOLD") or "0.8")
+    return dedupe_rules([rule for rules in extracted for rule in rules], threshold)
+
+async def get_llm_response(query):
+    return await general_llm_query(query)
+
+def stream_llm_response(query):
+    return stream_general_llm_query(query)
+
+def select_candidate_rules(paragraphs, rules, top_k=None, min_score=None):
+    """
+    Relevance pre-filter: score every (paragraph, rule) pair with BM25 over the
+    rule texts and keep, per paragraph, at most `top_k` rules scoring above
+    `min_score`.
+
+    Args:
+        paragraphs (list[tuple[Hashable, str]]): (paragraph key, content) pairs.
+        rules (list[tuple[int, str]]): (rule id, description) pairs.
+        top_k (int | None): Max rules per paragraph; defaults to PREFILTER_TOP_K.
+        min_score (float | None): Minimum BM25 score; defaults to PREFILTER_MIN_SCORE.
+
+    Returns:
+        dict[Hashable, list[tuple[int, str]]]: Candidate rules per paragraph key.
+    """
+    top_k = top_k or int(os.getenv("PREFILTER_TOP_K") or "10")
+    min_score = min_score if min_score is not None else float(os.getenv("PREFILTER_MIN_SCORE") or "0")
+    index = BM25Index([description for _, description in rules])
+    return {
+        paragraph_id: [rules[i] for i in sorted(index.top(content, top_k, min_score))]
+        for paragraph_id, content in paragraphs
+    }
+
+async def evaluate_matrix(paragraphs, rules, concurrency=None, pack_size=None, on_progress=None,
+                          candidates=None):
+    """
+    Evaluate every (paragraph, rule) pair concurrently.
+
+    Rules are packed `pack_size` at a time into one prompt per paragraph, so
+    the paragraph text and instructions are sent once per pack instead of once
+    per rule.
+
+    Args:
+        paragraphs (list[tuple[Hashable, str]]): (paragraph key, content) pairs; the key is
+            any identifier the caller uses for the paragraph (id, content hash, ...).
+        rules (list[tuple[int, str]]): (rule id, description) pairs.
+        concurrency (int | None): Max LLM calls in flight; defaults to CHECK_CONCURRENCY.
+        pack_size (int | None): Rules per prompt; defaults to CHECK_PACK_SIZE (1 disables packing).
+        on_progress (callable | None): Called as on_progress(done, total) after each pack completes.
+        candidates (dict[Hashable, list[tuple[int, str]]] | None): Rules to evaluate per paragraph key
+            (see select_candidate_rules); every rule for every paragraph when None.
+
+    Returns:
+        list[tuple[Hashable, int, str | Exception]]: One (paragraph key, rule id, result) per pair,
+        where result is the exception raised if the LLM call failed.
+    """
+    limit = asyncio.Semaphore(concurrency or int(os.getenv("CHECK_CONCURRENCY") or "16"))
+    pack_size = max(1, pack_size or int(os.getenv("CHECK_PACK_SIZE") or "8"))
+    work = []
+    for paragraph_id, content in paragraphs:
+        paragraph_rules = rules if candidates is None else candidates.get(paragraph_id, [])
+        for i in range(0, len(paragraph_rules), pack_size):
+            work.append((paragraph_id, content, paragraph_rules[i:i + pack_size]))
+    total = sum(len(pack) for _, _, pack in work)
+    done = 0
+
+    async def run(paragraph_id, content, pack):
+        nonlocal done
+        async with limit:
+            try:
+                results = await evaluate_paragraph_packed(content, [description for _, description in pack])
+            except Exception as e:
+                logger.warning("Check failed for paragraph %s / rules %s: %s",
+                               paragraph_id, [rule_id for rule_id, _ in pack], e)
+                results = [e] * len(pack)
+        done += len(pack)
+        if on_progress:
+            on_progress(done, total)
+        return [(paragraph_id, rule_id, result) for (rule_id, _), result in zip(pack, results)]
+
+    batches = await asyncio.gather(*(run(paragraph_id, content, pack) for paragraph_id, content, pack in work))
+    return [item for batch in batches for item in batch]
@@ -0,0 +1,40 @@
+# backend/db/bulk.py
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from db import models
+from core import parser
+
+
+def insert_paragraphs(db: Session, document_id: int, paragraphs: list[str], first_position: int = 0) -> list[int]:
+    """
+    Insert a document's paragraphs with one executemany (batched multi-row
+    INSERT ... RETURNING on Postgres) and return their ids in input order.
+    Paragraphs are numbered from `first_position`. Does not commit.
+    """
+    if not paragraphs:
+        return []
+    return list(db.scalars(
+        insert(models.Paragraph).returning(models.Paragraph.id, sort_by_parameter_order=True),
+        [{"document_id": document_id, "position": position, "content": paragraph,
+          "content_hash": parser.content_hash(paragraph)}
+         for position, paragraph in enumerate(paragraphs, start=first_position)],
+    ))
+
+
+def insert_document(db: Session, name: str, content: str | None, paragraphs: list[str]) -> tuple[int, list[int]]:
+    """Insert a document and all of its paragraphs in the current transaction. Does not commit."""
+    document_id = db.scalar(
+        insert(models.Document).values(name=name, content=content).returning(models.Document.id)
+    )
+    return document_id, insert_paragraphs(db, document_id, paragraphs)
+
+
+def insert_rules(db: Session, descriptions: list[str], first_number: int = 1) -> list[int]:
+    """Insert rules named "Rule N" in one executemany and return their ids in input order. Does not commit."""
+    if not descriptions:
+        return []
+    return list(db.scalars(
+        insert(models.ComplianceRule).returning(models.ComplianceRule.id, sort_by_parameter_order=True),
+        [{"name": f"Rule {i}", "description": description}
+         for i, description in enumerate(descriptions, start=first_number)],
+    ))
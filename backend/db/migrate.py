@@ -0,0 +1,82 @@
+# backend/db/migrate.py
+from sqlalchemy import bindparam, inspect, text, update
+from sqlalchemy.engine import Connection, Engine
+from db.models import Base, Paragraph, Violation
+from core import parser
+
+# Any constant works; it only has to be the same for every process running upgrade()
+_LOCK_ID = 7010
+_BATCH = 1000
+
+
+def add_missing_columns(conn: Connection):
+    """
+    Add model columns and indexes missing from tables that already exist.
+    create_all only creates missing tables, so databases from before a column
+    was added would otherwise fail every query that selects it.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    if_not_exists = " IF NOT EXISTS" if conn.dialect.name == "postgresql" else ""
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN{if_not_exists} {column.name} {column_type}"))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def backfill_paragraphs(conn: Connection):
+    """Number paragraphs by id within their document and hash their content where missing."""
+    paragraphs = Paragraph.__table__
+    document_ids = conn.execute(
+        text("SELECT DISTINCT document_id FROM paragraphs WHERE position IS NULL")
+    ).scalars().all()
+    for document_id in document_ids:
+        ids = conn.execute(
+            text("SELECT id FROM paragraphs WHERE document_id = :document_id ORDER BY id"),
+            {"document_id": document_id},
+        ).scalars().all()
+        rows = [{"p_id": paragraph_id, "p_position": position} for position, paragraph_id in enumerate(ids)]
+        for i in range(0, len(rows), _BATCH):
+            conn.execute(
+                update(paragraphs).where(paragraphs.c.id == bindparam("p_id")).values(position=bindparam("p_position")),
+                rows[i:i + _BATCH],
+            )
+
+    while True:
+        missing = conn.execute(
+            text("SELECT id, content FROM paragraphs WHERE content_hash IS NULL ORDER BY id LIMIT :limit"),
+            {"limit": _BATCH},
+        ).all()
+        if not missing:
+            break
+        conn.execute(
+            update(paragraphs).where(paragraphs.c.id == bindparam("p_id")).values(content_hash=bindparam("p_hash")),
+            [{"p_id": paragraph_id, "p_hash": parser.content_hash(content or "")} for paragraph_id, content in missing],
+        )
+
+
+def backfill_violations(conn: Connection):
+    violations = Violation.__table__
+    conn.execute(update(violations).where(violations.c.stale.is_(None)).values(stale=False))
+
+
+def upgrade(engine: Engine):
+    """
+    Create missing tables, add missing columns and indexes, and backfill the
+    derived columns of rows written before they existed. Idempotent; safe to
+    run at every start from both the API and the worker.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Serialize concurrent starts; DDL is transactional on Postgres
+            conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": _LOCK_ID})
+        Base.metadata.create_all(bind=conn)
+        add_missing_columns(conn)
+        backfill_paragraphs(conn)
+        backfill_violations(conn)
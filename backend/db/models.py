@@ -1,5 +1,6 @@
 # backend/db/models.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -21,16 +22,59 @@ class Paragraph(Base):
     __tablename__ = 'paragraphs'
     id = Column(Integer, primary_key=True)
     document_id = Column(Integer, ForeignKey('documents.id'))
+    position = Column(Integer)
     content = Column(Text)
+    content_hash = Column(String(64), index=True)
     violations = relationship("Violation", back_populates="paragraph")
 
+    __table_args__ = (
+        Index('ix_paragraphs_document_position', 'document_id', 'position'),
+    )
+
 class Violation(Base):
     __tablename__ = 'violations'
     id = Column(Integer, primary_key=True)
     paragraph_id = Column(Integer, ForeignKey('paragraphs.id'))
     rule_id = Column(Integer, ForeignKey('compliance_rules.id'))
     highlighted_text = Column(Text)
+    # [[start, end], ...] character offsets of the offending text in the paragraph
+    spans = Column(JSON)
+    # Check prompt templates that produced the verdict (core.prompts.check_version)
+    template_version = Column(String)
     suggested_fix = Column(Text)
     accepted = Column(Boolean, default=False)
+    # Set when the paragraph or rule changed after this result was computed
+    stale = Column(Boolean, default=False, index=True)
 
     paragraph = relationship("Paragraph", back_populates="violations")
+
+class LLMCacheEntry(Base):
+    __tablename__ = 'llm_cache'
+    key = Column(String(64), primary_key=True)
+    kind = Column(String)
+    value = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ExtractedText(Base):
+    __tablename__ = 'extracted_texts'
+    key = Column(String(64), primary_key=True)
+    file_type = Column(String)
+    text = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True)
+    kind = Column(String)
+    status = Column(String, default='queued', index=True)
+    payload = Column(JSON)
+    result = Column(JSON)
+    error = Column(Text)
+    progress_done = Column(Integer, default=0)
+    progress_total = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    worker_id = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,41 @@
+# backend/db/pagination.py
+import json
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+
+def keyset_page(db: Session, model, key: str, filters: list, after: int | None, limit: int | None,
+                fields: str | None) -> Response:
+    """
+    Serve one page of `model` rows ordered by the integer column `key`,
+    starting after the cursor value `after`.
+
+    Only the requested columns (`fields`, comma separated; all columns when
+    omitted) are selected and rows go straight from the result tuples to
+    JSON, skipping ORM hydration and FastAPI's generic encoder. The body is a
+    JSON list; when the page is full the cursor for the next page is returned
+    in the X-Next-Cursor header.
+    """
+    columns = model.__table__.columns
+    names = [name.strip() for name in fields.split(",")] if fields else list(columns.keys())
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    query = select(columns[key], *(columns[name] for name in names)).where(*filters)
+    if after is not None:
+        query = query.where(columns[key] > after)
+    rows = db.execute(query.order_by(columns[key]).limit(limit)).all()
+
+    response = Response(
+        content=json.dumps([dict(zip(names, row[1:])) for row in rows], default=str),
+        media_type="application/json",
+    )
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1][0])
+    return response
@@ -1,10 +1,43 @@
 # backend/main.py
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from time import perf_counter
+from fastapi import FastAPI, Request
 from api.routes import router
-from db.models import Base
-from db.session import engine
+from core import metrics
+from core.extract import shutdown_extractor
+from core.llm_client import close_client
+from core.endpoints import get_pool, close_pool
+from db import migrate
+from db.session import engine, SessionLocal
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    health_checks = asyncio.create_task(
+        get_pool().run_health_checks(float(os.getenv("LLM_HEALTH_INTERVAL") or "10"))
+    )
+    yield
+    health_checks.cancel()
+    shutdown_extractor()
+    await close_pool()
+    await close_client()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(router)
 
-Base.metadata.create_all(bind=engine)
+metrics.instrument_engine(engine)
+metrics.register_state_collector(SessionLocal)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = perf_counter()
+    response = await call_next(request)
+    # Label by route template so /rules/1 and /rules/2 share a series
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.labels(
+        request.method, route.path if route else "unmatched", str(response.status_code)
+    ).observe(perf_counter() - started)
+    return response
+
+migrate.upgrade(engine)
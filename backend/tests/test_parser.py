@@ -0,0 +1,106 @@
+# backend/tests/test_parser.py
+"""
+Unit tests for the streaming segmenter in core.parser.
+
+Run from backend/:  python -m pytest tests
+"""
+import pytest
+
+from core import parser
+from core.parser import Segmenter
+
+
+def segment(text, chunks=None, **kwargs):
+    segmenter = Segmenter(**kwargs)
+    out = []
+    for chunk in chunks or [text]:
+        out += segmenter.feed(chunk)
+    return out + segmenter.finish()
+
+
+@pytest.mark.parametrize("text", [
+    "Payment is due within\n30 days of the invoice date.",
+    "Records must be kept for\n7 years after the contract ends.",
+    "The supplier must comply with section\n3.2 of the annex at all times.",
+    "Notice must be given at least\n14. days before termination.",
+])
+def test_wrapped_line_starting_with_a_number_continues_the_clause(text):
+    assert segment(text) == [" ".join(text.split())]
+
+
+def test_break_into_paragraphs_keeps_wrapped_numbers_joined(monkeypatch):
+    monkeypatch.delenv("SEGMENT_MIN_TOKENS", raising=False)
+    monkeypatch.delenv("SEGMENT_MAX_TOKENS", raising=False)
+    assert parser.break_into_paragraphs("Payment is due within\n30 days of the invoice date.") == [
+        "Payment is due within 30 days of the invoice date."
+    ]
+
+
+def test_numbered_clauses_are_separate_segments():
+    text = (
+        "1. The supplier shall deliver the goods on time.\n"
+        "2. The buyer shall pay within 30 days.\n"
+        "3.1 Either party may terminate on written notice."
+    )
+    assert segment(text) == text.split("\n")
+
+
+def test_numbered_clause_joins_its_wrapped_lines():
+    text = "4. The supplier shall keep records of all deliveries for\n7 years and provide them on request."
+    assert segment(text) == [" ".join(text.split())]
+
+
+def test_lead_in_keeps_its_list_items():
+    text = "The supplier shall:\n(a) deliver on time;\n(b) invoice monthly."
+    assert segment(text) == [text]
+
+
+def test_consecutive_bullets_stay_together():
+    text = "Staff must follow these rules:\n- lock screens when away;\n- report lost devices."
+    assert segment(text) == [text]
+
+
+def test_hyphenation_is_undone():
+    assert segment("All backups must be encryp-\ntion protected at rest and in transit.") == [
+        "All backups must be encryption protected at rest and in transit."
+    ]
+
+
+@pytest.mark.parametrize("heading", ["SECURITY CONTROLS", "Section 4 Access Control", "3 Definitions"])
+def test_heading_stays_with_the_text_under_it(heading):
+    body = "All laptops must use full disk encryption at all times."
+    assert segment(f"{heading}\n\n{body}") == [f"{heading}\n{body}"]
+
+
+def test_blank_line_separates_paragraphs():
+    text = "Vendors must rotate credentials every quarter.\n\nVendors must log all access to production data."
+    assert segment(text) == text.split("\n\n")
+
+
+def test_page_numbers_are_dropped():
+    text = "Vendors must rotate credentials every quarter.\n12\nPage 3 of 40\nVendors must log all access."
+    assert segment(text) == ["Vendors must rotate credentials every quarter.", "Vendors must log all access."]
+
+
+def test_short_fragment_is_merged_into_a_neighbour():
+    assert segment("Ok.\n\nVendors must rotate credentials every quarter without exception.") == [
+        "Ok.\nVendors must rotate credentials every quarter without exception."
+    ]
+
+
+def test_segments_are_split_at_max_tokens():
+    segments = segment(" ".join(["word"] * 100), max_tokens=20)
+    assert len(segments) > 1
+    assert all(parser.estimate_tokens(s) <= 20 for s in segments)
+    assert " ".join(segments).split() == ["word"] * 100
+
+
+def test_chunked_input_matches_whole_text():
+    text = (
+        "Payment is due within\n30 days of the invoice date.\n\n"
+        "1. The supplier shall deliver the goods on time.\n"
+        "2. The buyer shall pay within 30 days.\n\n"
+        "The supplier shall:\n(a) deliver on time;\n(b) invoice monthly."
+    )
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    assert segment(text, chunks) == segment(text)
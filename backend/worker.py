@@ -0,0 +1,51 @@
+# backend/worker.py
+import asyncio
+import logging
+import os
+import socket
+from prometheus_client import start_http_server
+from core import jobs, metrics
+from core.llm_client import close_client
+from core.endpoints import get_pool, close_pool
+from db import session
+from db import migrate
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    poll_interval = float(os.getenv("JOB_POLL_INTERVAL") or "2")
+    logger.info("Worker %s started", worker_id)
+    health_checks = asyncio.create_task(
+        get_pool().run_health_checks(float(os.getenv("LLM_HEALTH_INTERVAL") or "10"))
+    )
+    try:
+        while True:
+            db = session.SessionLocal()
+            try:
+                job = jobs.claim(db, worker_id)
+                job_id = job.id if job else None
+            finally:
+                db.close()
+
+            if job_id is None:
+                await asyncio.sleep(poll_interval)
+                continue
+
+            logger.info("Worker %s running job %s", worker_id, job_id)
+            await jobs.run(job_id, worker_id)
+    finally:
+        health_checks.cancel()
+        await close_pool()
+        await close_client()
+
+
+if __name__ == "__main__":
+    migrate.upgrade(session.engine)
+    metrics.instrument_engine(session.engine)
+    metrics_port = int(os.getenv("WORKER_METRICS_PORT") or "0")
+    if metrics_port:
+        start_http_server(metrics_port)
+    asyncio.run(main())
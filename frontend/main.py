@@ -1,11 +1,10 @@
 # New Streamlit UI design
 import streamlit as st
 import requests
+import html
+import json
 import os
-import io
-import docx
-import pandas as pd
-import PyPDF2
+from concurrent.futures import ThreadPoolExecutor
 
 API_BASE = os.getenv("API_BASE")
 
@@ -16,38 +15,106 @@ st.title("🛡️ Document Compliance Checker")
 for key in [
     "rules", "generated_rules", "rule_edits", "rule_file_content",
     "doc_paragraphs", "doc_file_content", "current_index",
-    "violation_result", "suggested_fix", "manual_edit"
+    "violation_result", "suggested_fix", "manual_edit", "violation_ids",
+    "rule_file_key", "document_id", "violation_spans", "paragraph_ids", "fix_pending"
 ]:
     if key not in st.session_state:
-        st.session_state[key] = None if key in ["violation_result", "suggested_fix", "manual_edit"] else []
+        st.session_state[key] = None if key in ["violation_result", "suggested_fix", "manual_edit", "fix_pending"] else []
 
-# --- Utility: Extract Text ---
+# --- Utility: Extract Text (on the backend, cached there by file hash) ---
 def extract_text(file):
-    file_type = file.name.split('.')[-1].lower()
-    if file_type == "txt":
-        return file.read().decode("utf-8")
-    elif file_type == "pdf":
-        reader = PyPDF2.PdfReader(file)
-        return "\n".join(page.extract_text() or "" for page in reader.pages)
-    elif file_type == "csv":
-        df = pd.read_csv(file)
-        return df.to_string(index=False)
-    elif file_type == "docx":
-        doc = docx.Document(file)
-        return "\n".join([para.text for para in doc.paragraphs])
-    return ""
+    files = {"file": (file.name, file.getvalue())}
+    response = requests.post(f"{API_BASE}/extract_text", files=files)
+    response.raise_for_status()
+    return response.json()["text"]
+
+# --- Utility: Upload a file for checking and load its paragraphs ---
+def upload_document(file):
+    files = {"file": (file.name, file.getvalue())}
+    response = requests.post(f"{API_BASE}/upload_for_checking/file", files=files)
+    response.raise_for_status()
+    document_id = response.json()["document_id"]
+
+    rows = fetch_all("/document_paragraphs", {"doc_id": document_id, "fields": "id,content"})
+    return document_id, [row["id"] for row in rows], [row["content"] for row in rows]
+
+# --- Utility: Follow X-Next-Cursor through a paginated listing ---
+def fetch_all(path, params):
+    rows = []
+    params = {**params, "limit": 10000}
+    while True:
+        page = requests.get(f"{API_BASE}{path}", params=params)
+        page.raise_for_status()
+        rows.extend(page.json())
+        cursor = page.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return rows
+        params["after"] = cursor
+
+# --- Utility: Push sidebar rule edits to the backend (marks their results stale) ---
+def save_rule_edits():
+    for rule, description in zip(st.session_state.rules, st.session_state.rule_edits):
+        if description != rule["description"]:
+            response = requests.put(f"{API_BASE}/rules/{rule['id']}",
+                                    json={"name": rule["name"], "description": description})
+            response.raise_for_status()
+            rule["description"] = description
+
+# --- Utility: Check one paragraph against every rule, a few rules at a time ---
+def check_paragraph(paragraph_id):
+    def check(rule):
+        response = requests.post(f"{API_BASE}/check_violation",
+                                 json={"rule_id": rule["id"], "paragraph_id": paragraph_id})
+        response.raise_for_status()
+        return rule, response.json()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(check, st.session_state.rules))
+    return [(rule, out) for rule, out in results if out["violated"]]
+
+# --- Utility: Mark violation spans ([start, end] offsets) in a paragraph ---
+def highlight(paragraph, spans):
+    out, last = [], 0
+    for start, end in sorted(spans):
+        start = max(start, last)
+        if start >= end:
+            continue
+        out.append(html.escape(paragraph[last:start]))
+        out.append(f"<mark>{html.escape(paragraph[start:end])}</mark>")
+        last = end
+    out.append(html.escape(paragraph[last:]))
+    return "".join(out)
+
+# --- Utility: Stream SSE tokens from the backend ---
+def stream_tokens(path, payload):
+    with requests.post(f"{API_BASE}{path}", json=payload, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: ") or line == "data: [DONE]":
+                continue
+            event = json.loads(line[len("data: "):])
+            if "error" in event:
+                st.error(event["error"])
+                return
+            yield event["content"]
 
 # --- Sidebar: Upload Compliance Rules ---
 st.sidebar.header("📜 Upload Compliance Rule Document")
 rule_file = st.sidebar.file_uploader("Upload rules (txt/pdf/csv/docx)", type=["txt", "pdf", "csv", "docx"], key="rule_upload")
 
 if rule_file:
-    st.session_state.rule_file_content = extract_text(rule_file)
+    # Extract once per file rather than on every rerun
+    rule_file_key = f"{rule_file.name}:{rule_file.size}"
+    if st.session_state.rule_file_key != rule_file_key:
+        st.session_state.rule_file_content = extract_text(rule_file)
+        st.session_state.rule_file_key = rule_file_key
     if st.sidebar.button("📄 Generate Rules with LLM"):
         response = requests.post(f"{API_BASE}/generate_rules", json={"text": st.session_state.rule_file_content})
         if response.ok:
             st.session_state.generated_rules = response.json()["rules"]
-            st.session_state.rule_edits = st.session_state.generated_rules.copy()
+            # Check against the stored rules (near-duplicates were merged into existing ones)
+            st.session_state.rules = fetch_all("/rules", {"fields": "id,name,description"})
+            st.session_state.rule_edits = [rule["description"] for rule in st.session_state.rules]
 
 # --- Sidebar: Display and Edit Rules ---
 if st.session_state.rule_edits:
@@ -61,8 +128,9 @@ with col1:
     st.header("📁 Upload Document to Check")
     doc_file = st.file_uploader("Upload document (txt/pdf/csv/docx)", type=["txt", "pdf", "csv", "docx"], key="doc_upload")
     if doc_file and st.button("📄 Parse Document"):
-        text = extract_text(doc_file)
-        paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+        document_id, paragraph_ids, paragraphs = upload_document(doc_file)
+        st.session_state.document_id = document_id
+        st.session_state.paragraph_ids = paragraph_ids
         st.session_state.doc_paragraphs = paragraphs
         st.session_state.current_index = 0
 
@@ -81,27 +149,49 @@ with col2:
             st.markdown(f"**➡️ Next:**\n{next_}")
 
             if st.button("🔍 Check Compliance Violations"):
-                data = {
-                    "paragraph": curr,
-                    "preceding": prev,
-                    "following": next_,
-                    "rules": st.session_state.rule_edits
-                }
-                res = requests.post(f"{API_BASE}/check_compliance_block", json=data)
-                if res.ok:
-                    out = res.json()
-                    st.session_state.violation_result = out["violation"]
-                    st.session_state.suggested_fix = out["suggestion"]
-                    st.session_state.manual_edit = st.session_state.suggested_fix
+                if not st.session_state.rules:
+                    st.warning("Generate rules before checking.")
+                else:
+                    save_rule_edits()
+                    found = check_paragraph(st.session_state.paragraph_ids[idx])
+                    st.session_state.violation_ids = [out["violation_id"] for _, out in found]
+                    st.session_state.violation_spans = [span for _, out in found for span in out["spans"]]
+                    st.session_state.violation_result = "\n\n".join(
+                        f"{rule['name']}: {out['highlighted_text']}" for rule, out in found
+                    ) or None
+                    st.session_state.suggested_fix = None
+                    st.session_state.fix_pending = bool(found)
+                    if not found:
+                        st.success("No violations found.")
 
         if st.session_state.violation_result:
             st.subheader("⚠️ Violation Found")
+            if st.session_state.violation_spans:
+                st.markdown(highlight(curr, st.session_state.violation_spans), unsafe_allow_html=True)
             st.code(st.session_state.violation_result, language="text")
 
-        if st.session_state.suggested_fix:
+        streamed = False
+        if st.session_state.fix_pending:
+            # Render the fix token-by-token as the backend streams it
             st.subheader("✂️ LLM Suggested Fix")
+            st.session_state.suggested_fix = st.write_stream(
+                stream_tokens("/suggest_fix/stream", {"violation_ids": st.session_state.violation_ids})
+            )
+            st.session_state.manual_edit = st.session_state.suggested_fix
+            st.session_state.fix_pending = False
+            streamed = True
+
+        if st.session_state.suggested_fix:
+            if not streamed:
+                st.subheader("✂️ LLM Suggested Fix")
             st.session_state.manual_edit = st.text_area("Modify Fix", value=st.session_state.manual_edit)
             if st.button("✅ Accept & Next"):
+                response = requests.post(f"{API_BASE}/accept_edit", json={
+                    "violation_id": st.session_state.violation_ids[0],
+                    "new_text": st.session_state.manual_edit,
+                    "accepted": True,
+                })
+                response.raise_for_status()
                 st.session_state.doc_paragraphs[idx] = st.session_state.manual_edit
                 st.session_state.current_index += 1
                 st.session_state.violation_result = None
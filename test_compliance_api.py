@@ -1,3 +1,4 @@
+import json
 import requests
 import time
 
@@ -37,6 +38,30 @@ def test_upload_for_checking():
     print('')
     return doc_id
 
+# ---------- 2b. Stream Upload Document to Check ----------
+def test_upload_for_checking_stream():
+    def body():
+        for line in DOCUMENT_TO_CHECK.splitlines(keepends=True):
+            yield line.encode("utf-8")
+    response = requests.post(f"{BASE_URL}/upload_for_checking/stream",
+                             params={"name": "Streamed Document to Check"}, data=body())
+    response.raise_for_status()
+    result = response.json()
+    print(f"✅ Streamed Document to Check. ID: {result['document_id']} ({result['paragraphs']} paragraphs)")
+    print('')
+    return result["document_id"]
+
+# ---------- 2c. Upload a File to Check (extracted on the backend) ----------
+def test_upload_file_for_checking():
+    files = {"file": ("document_to_check.txt", DOCUMENT_TO_CHECK.encode("utf-8"))}
+    response = requests.post(f"{BASE_URL}/upload_for_checking/file", files=files)
+    response.raise_for_status()
+    result = response.json()
+    print(f"✅ Uploaded File to Check. ID: {result['document_id']} "
+          f"({result['paragraphs']} paragraphs, cached: {result['cached']})")
+    print('')
+    return result["document_id"]
+
 # ---------- 3. Get Paragraphs ----------
 def test_get_paragraphs(doc_id):
     response = requests.get(f"{BASE_URL}/document_paragraphs", params={"doc_id": doc_id})
@@ -55,6 +80,15 @@ def test_generate_rules():
     print('')
     return rules
 
+# ---------- 4b. Regenerate Rules (merges into the stored ones) ----------
+def test_regenerate_rules():
+    response = requests.post(f"{BASE_URL}/generate_rules", json={"text": DOCUMENT_FOR_RULES})
+    response.raise_for_status()
+    result = response.json()
+    print(f"✅ Regenerated Rules: {result['created']} created, {result['merged']} merged into existing rules.")
+    print('')
+    return result
+
 # ---------- 5. Get All Rules ----------
 def test_get_all_rules():
     response = requests.get(f"{BASE_URL}/rules")
@@ -97,6 +131,9 @@ def test_check_violation(rule_id, paragraph_id):
     response.raise_for_status()
     result = response.json()
     print(f"✅ Violation Checked. ID: {result['violation_id']} Text: {result['highlighted_text']}")
+    assert all(0 <= start < end for start, end in result["spans"]), "Bad violation span offsets"
+    assert isinstance(result["violated"], bool), "Missing violated flag"
+    print(f"   Violated: {result['violated']} Spans: {result['spans']}")
     print('')
     return result["violation_id"]
 
@@ -104,8 +141,11 @@ def test_check_violation(rule_id, paragraph_id):
 def test_suggest_fix(violation_ids):
     response = requests.post(f"{BASE_URL}/suggest_fix", json={"violation_ids": violation_ids})
     response.raise_for_status()
-    fix = response.json()["suggested_fix"]
+    result = response.json()
+    fix = result["suggested_fix"]
     print(f"✅ Suggested Fix for Violations {violation_ids}:\n   {fix}")
+    if "edits" in result:
+        print(f"   Span edits: {len(result['edits'])}")
     print('')
     return fix
 
@@ -131,6 +171,15 @@ def test_paragraph_neighbors(paragraph_id):
     print("   Next:", result['next']['content'] if result['next'] else "None")
     print('')
 
+# ---------- 11b. Get Paragraph Window ----------
+def test_paragraph_range(doc_id, start, end):
+    response = requests.get(f"{BASE_URL}/documents/{doc_id}/paragraphs", params={"from": start, "to": end})
+    response.raise_for_status()
+    paragraphs = response.json()
+    print(f"✅ Retrieved paragraphs {start}..{end}: {[p['position'] for p in paragraphs]}")
+    print('')
+    return paragraphs
+
 # ---------- 12. General LLM Query ----------
 def test_general_llm_query(prompt):
     response = requests.post(f"{BASE_URL}/llm_query", json={"prompt": prompt})
@@ -140,15 +189,77 @@ def test_general_llm_query(prompt):
     print('')
     return result["response"]
 
+# ---------- 13. Check Whole Document ----------
+def test_check_document(doc_id, rule_ids):
+    response = requests.post(f"{BASE_URL}/documents/{doc_id}/check", json={"rule_ids": rule_ids})
+    response.raise_for_status()
+    summary = response.json()
+    print(f"✅ Document Checked: {summary['checks']} checks, {summary['failed']} failed in {summary['elapsed_seconds']}s")
+    print('')
+    return summary
+
+# ---------- 14. Queue Background Job and Poll ----------
+def test_background_job(doc_id, timeout=120):
+    response = requests.post(f"{BASE_URL}/jobs", json={"kind": "check_document", "payload": {"document_id": doc_id}})
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(2)
+    print(f"✅ Job {job_id} finished with status {job['status']} ({job['progress_done']}/{job['progress_total']})")
+    print('')
+    return job
+
+# ---------- 15. Streaming LLM Query ----------
+def test_general_llm_query_stream(prompt):
+    first_token_at = None
+    started = time.time()
+    chunks = []
+    with requests.post(f"{BASE_URL}/llm_query/stream", json={"prompt": prompt}, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data: ") and line != "data: [DONE]":
+                first_token_at = first_token_at or time.time()
+                chunks.append(json.loads(line[len("data: "):]).get("content", ""))
+    ttft = (first_token_at or time.time()) - started
+    print(f"✅ Streamed LLM Query Response ({len(chunks)} chunks, first token after {ttft:.2f}s):\n   {''.join(chunks)}")
+    print('')
+    return "".join(chunks)
+
+# ---------- 16. Compact Near-Duplicate Rules (dry run) ----------
+def test_compact_rules():
+    response = requests.post(f"{BASE_URL}/rules/compact", json={"dry_run": True})
+    response.raise_for_status()
+    result = response.json()
+    print(f"✅ Rule Compaction Dry Run: {result['removed']} duplicates, {result['remaining']} rules would remain")
+    print('')
+    return result
+
+# ---------- 17. Re-check Stale Pairs ----------
+def test_recheck_document(doc_id):
+    response = requests.post(f"{BASE_URL}/documents/{doc_id}/recheck", json={})
+    response.raise_for_status()
+    summary = response.json()
+    print(f"✅ Document Re-checked: {summary['rechecked']}/{summary['stale_pairs']} stale pairs")
+    print('')
+    return summary
+
 # ---------- 🚀 Run All Tests ----------
 def run_all_tests():
     rules_doc_id = test_upload_for_rules()
     check_doc_id = test_upload_for_checking()
+    test_upload_for_checking_stream()
+    test_upload_file_for_checking()
     paragraphs = test_get_paragraphs(check_doc_id)
     paragraph_id = paragraphs[1]["id"] if len(paragraphs) > 1 else paragraphs[0]["id"]
 
     rules = test_generate_rules()
+    test_regenerate_rules()
     rule_records = test_get_all_rules()
+    test_compact_rules()
 
     # Use the first 2 rules to simulate multiple violations
     violation_ids = []
@@ -167,9 +278,20 @@ def run_all_tests():
 
     # Test paragraph navigation
     test_paragraph_neighbors(paragraph_id)
+    test_paragraph_range(check_doc_id, 0, 2)
 
     # General LLM query
     test_general_llm_query("What is the purpose of data encryption?")
+    test_general_llm_query_stream("What is the purpose of data encryption?")
+
+    # Whole-document check against the rules used above
+    test_check_document(check_doc_id, [r["id"] for r in rule_records[:2]])
+
+    # Same check, queued for the worker service
+    test_background_job(check_doc_id)
+
+    # The accepted edit above left its paragraph's results stale
+    test_recheck_document(check_doc_id)
 
 
 if __name__ == "__main__":